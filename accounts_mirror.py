@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Column of each field in the accounts sheet rows written by the bot
+FIELDS = {
+    "desired_email": 0,
+    "name": 2,
+    "comment": 3,
+    "secondary_email": 4,
+    "timestamp": 5,
+    "requested_by": 6,
+}
+
+
+class AccountsMirror:
+    """Local SQLite copy of the accounts sheet, indexed for lookups.
+
+    ``fetch_rows(start_row)`` returns the sheet rows from ``start_row`` (1-based)
+    to the end. ``sync()`` only reads the rows added since the previous sync and
+    rereads the whole sheet every ``full_sync_interval`` seconds to pick up
+    edited or deleted rows. Rows the bot appends itself are added with ``add``
+    straight away and matched to their sheet row on the next sync.
+    """
+
+    def __init__(self, fetch_rows, db_path=":memory:", full_sync_interval=86400):
+        self._fetch_rows = fetch_rows
+        self.full_sync_interval = full_sync_interval
+        self._sync_lock = None
+        self.last_sync = None
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "sheet_row INTEGER UNIQUE, "
+            "desired_email TEXT NOT NULL, "
+            "name TEXT, comment TEXT, secondary_email TEXT, "
+            "timestamp TEXT, requested_by TEXT);"
+            "CREATE INDEX IF NOT EXISTS accounts_desired_email ON accounts (desired_email);"
+            "CREATE INDEX IF NOT EXISTS accounts_secondary_email ON accounts (secondary_email);"
+            "CREATE INDEX IF NOT EXISTS accounts_requested_by ON accounts (requested_by, timestamp);"
+            "CREATE INDEX IF NOT EXISTS accounts_timestamp ON accounts (timestamp);"
+            "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value REAL NOT NULL);"
+        )
+
+    def _state(self, key):
+        row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @property
+    def synced_rows(self):
+        """Number of sheet rows read so far."""
+        return int(self._state("synced_rows"))
+
+    @staticmethod
+    def _to_record(values):
+        values = list(values) + [""] * (len(FIELDS) + 1 - len(values))
+        record = {field: values[column].strip() for field, column in FIELDS.items()}
+        record["desired_email"] = record["desired_email"].lower()
+        record["secondary_email"] = record["secondary_email"].lower()
+        return record
+
+    def _insert(self, sheet_row, record):
+        self._db.execute(
+            "INSERT OR REPLACE INTO accounts (sheet_row, desired_email, name, comment, "
+            "secondary_email, timestamp, requested_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (sheet_row, *(record[field] for field in FIELDS)),
+        )
+
+    def add(self, values):
+        """Record rows just appended to the sheet by the bot."""
+        with self._db:
+            for row in values:
+                self._insert(None, self._to_record(row))
+
+    async def sync(self):
+        """Read new sheet rows, or the whole sheet when a full sync is due."""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            started = time.monotonic()
+            full = time.time() - self._state("last_full_sync") >= self.full_sync_interval
+            start_row = 1 if full else self.synced_rows + 1
+            rows = await self._fetch_rows(start_row)
+
+            with self._db:
+                if full:
+                    self._db.execute("DELETE FROM accounts WHERE sheet_row IS NOT NULL")
+                added = set()
+                for offset, values in enumerate(rows):
+                    if not values or "@" not in values[0]:
+                        # Headers, blank rows and anything else that is not a request
+                        continue
+                    record = self._to_record(values)
+                    self._insert(start_row + offset, record)
+                    added.add(record["desired_email"])
+                # Rows added by the bot are now known with their sheet row
+                self._db.executemany(
+                    "DELETE FROM accounts WHERE sheet_row IS NULL AND desired_email = ?",
+                    [(email,) for email in added],
+                )
+                state = {"synced_rows": start_row - 1 + len(rows)}
+                if full:
+                    state["last_full_sync"] = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                    state.items(),
+                )
+            self.last_sync = time.time()
+            logger.info(
+                f"Accounts mirror {'reloaded' if full else 'synced'}: {len(rows)} rows read "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+    def find(self, email):
+        """Return the latest request for a desired email, or None."""
+        row = self._db.execute(
+            "SELECT * FROM accounts WHERE desired_email = ? ORDER BY timestamp DESC LIMIT 1",
+            (email.strip().lower(),),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def lookup(self, email):
+        """Return every request whose desired or secondary email matches."""
+        email = email.strip().lower()
+        return [
+            dict(row)
+            for row in self._db.execute(
+                "SELECT * FROM accounts WHERE desired_email = ? "
+                "UNION SELECT * FROM accounts WHERE secondary_email = ? "
+                "ORDER BY timestamp",
+                (email, email),
+            )
+        ]
+
+    def since(self, timestamp, requested_by=None):
+        """Return requests made at or after ``timestamp`` ("YYYY-MM-DD ...")."""
+        query = "SELECT * FROM accounts WHERE timestamp >= ?"
+        params = [timestamp]
+        if requested_by:
+            query += " AND requested_by = ?"
+            params.append(requested_by)
+        return [dict(row) for row in self._db.execute(query + " ORDER BY timestamp", params)]
@@ -0,0 +1,340 @@
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+
+import gspread
+
+logger = logging.getLogger(__name__)
+
+LOG_HEADERS = ["Timestamp", "Username", "User ID", "Type", "Content", "Handler", "Tenant"]
+
+# Target emails mentioned in a message, indexed for /audit --email
+TARGET_EMAIL_RE = re.compile(r"[\w.+'-]+@[\w-]+(?:\.[\w-]+)+")
+
+AUDIT_USAGE = (
+    "Usage: /audit [--user <username>] [--command <name>] [--email <email>] "
+    "[--since <YYYY-MM-DD | 7d>] [--until <YYYY-MM-DD>] [--limit <n>]"
+)
+
+
+def parse_audit_args(args, today=None):
+    """Turn /audit arguments into query filters; ValueError on bad input.
+
+    ``--since`` takes a date or a number of days back, ``--until`` a date
+    whose entries are still included.
+    """
+    today = today or datetime.date.today()
+    filters = {"limit": 20}
+    args = list(args)
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg == "--user":
+                filters["username"] = args.pop(0).lstrip("@")
+            elif arg == "--command":
+                filters["command"] = args.pop(0)
+            elif arg == "--email":
+                filters["email"] = args.pop(0).lower()
+            elif arg in ("--since", "--until"):
+                value = args.pop(0)
+                if arg == "--since" and value.endswith("d") and value[:-1].isdigit():
+                    day = today - datetime.timedelta(days=int(value[:-1]))
+                else:
+                    day = datetime.date.fromisoformat(value)
+                if arg == "--until":
+                    day += datetime.timedelta(days=1)
+                filters[arg[2:]] = datetime.datetime.combine(day, datetime.time()).timestamp()
+            elif arg == "--limit":
+                filters["limit"] = max(1, min(int(args.pop(0)), 200))
+            else:
+                raise ValueError(arg)
+    except IndexError:
+        raise ValueError("missing value") from None
+    return filters
+
+
+class AuditStore:
+    """Append-only audit trail in SQLite, indexed for /audit queries.
+
+    Entries are indexed by username, handler, command and time, and the
+    emails they mention are kept in a separate indexed table. The ID of the
+    last entry exported to Google Sheets is kept in ``export_state``.
+    """
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        self._db = None
+
+    def _connect(self):
+        if self._db is not None:
+            return self._db
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self._db_path)
+        self._db.row_factory = sqlite3.Row
+        # Keeps each insert cheap enough to run on the event loop
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audit ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "created_at REAL NOT NULL, "
+            "username TEXT, "
+            "user_id TEXT, "
+            "type TEXT NOT NULL, "
+            "content TEXT NOT NULL, "
+            "command TEXT, "
+            "handler TEXT NOT NULL, "
+            "tenant TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS audit_time ON audit (created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS audit_user ON audit (username, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS audit_handler ON audit (handler, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS audit_command ON audit (command, created_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audit_targets (audit_id INTEGER NOT NULL, email TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS audit_targets_email ON audit_targets (email)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS export_state (last_id INTEGER NOT NULL)")
+        return self._db
+
+    def add(self, entry):
+        """Store an entry (a dict with the ``LOG_HEADERS`` fields) and return its ID."""
+        db = self._connect()
+        content = entry.get("content", "")
+        command = content.split()[0].split("@")[0].lower() if content.startswith("/") else None
+        with db:
+            cursor = db.execute(
+                "INSERT INTO audit (created_at, username, user_id, type, content, command, "
+                "handler, tenant) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.get("created_at", time.time()),
+                    entry.get("username"),
+                    entry.get("user_id"),
+                    entry["type"],
+                    content,
+                    command,
+                    entry["handler"],
+                    entry.get("tenant"),
+                ),
+            )
+            emails = {email.lower() for email in TARGET_EMAIL_RE.findall(content)}
+            db.executemany(
+                "INSERT INTO audit_targets (audit_id, email) VALUES (?, ?)",
+                [(cursor.lastrowid, email) for email in emails],
+            )
+        return cursor.lastrowid
+
+    def query(self, username=None, command=None, email=None, since=None, until=None, limit=20):
+        """Return matching entries as dicts, newest first.
+
+        ``command`` matches a handler name ("suspend_user") or a command
+        ("suspend" or "/suspend"); ``since`` and ``until`` are timestamps.
+        """
+        conditions = []
+        params = []
+        if username:
+            conditions.append("username = ?")
+            params.append(username)
+        if command:
+            conditions.append("(handler = ? OR command = ?)")
+            params.extend([command, "/" + command.lstrip("/").lower()])
+        if email:
+            conditions.append("id IN (SELECT audit_id FROM audit_targets WHERE email = ?)")
+            params.append(email.lower())
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM audit {where}ORDER BY created_at DESC, id DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [dict(row) for row in rows]
+
+    def exported_id(self):
+        row = self._connect().execute("SELECT last_id FROM export_state").fetchone()
+        return row[0] if row else 0
+
+    def set_exported_id(self, last_id):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM export_state")
+            db.execute("INSERT INTO export_state (last_id) VALUES (?)", (last_id,))
+
+    def after(self, last_id, limit):
+        """Return up to ``limit`` entries with an ID above ``last_id``, oldest first."""
+        rows = self._connect().execute(
+            "SELECT * FROM audit WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        )
+        return [dict(row) for row in rows]
+
+    def count_after(self, last_id):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM audit WHERE id > ?", (last_id,)
+        ).fetchone()[0]
+
+
+def format_timestamp(created_at):
+    return datetime.datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_entry(entry, show_tenant=False):
+    """Return one line of /audit output."""
+    tenant = f" [{entry['tenant']}]" if show_tenant and entry["tenant"] else ""
+    content = entry["content"].replace("\n", " ")
+    if len(content) > 200:
+        content = content[:200] + "…"
+    return f"{format_timestamp(entry['created_at'])} @{entry['username']}{tenant} {entry['handler']}: {content}"
+
+
+def sheet_row(entry):
+    return [
+        format_timestamp(entry["created_at"]),
+        entry["username"],
+        entry["user_id"],
+        entry["type"],
+        entry["content"],
+        entry["handler"],
+        entry["tenant"] or "",
+    ]
+
+
+class AuditLogWriter:
+    """Record audit entries locally and export them to monthly worksheets.
+
+    Handlers add entries to the ``AuditStore`` without waiting for Google.
+    A background task exports the entries after the last exported one to a
+    worksheet per month ("Logs 2024-06") of the logs spreadsheet, with one
+    ``append_rows`` call per batch. Entries that cannot be exported stay in
+    the store and are retried on the next flush.
+    """
+
+    def __init__(self, store, open_spreadsheet, run, spill_file=None, batch_size=50, flush_interval=5.0):
+        self.store = store
+        self._open_spreadsheet = open_spreadsheet
+        self._run = run
+        self._worksheets = {}
+        self.spill_file = spill_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        # Kept in memory, the metrics thread cannot use the SQLite connection
+        self._pending = 0
+
+    def enqueue(self, entry):
+        """Store an entry for export; never waits for Google."""
+        self.store.add(entry)
+        self._pending += 1
+        if self._wakeup and self._pending >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self):
+        """Return the number of entries waiting to be exported."""
+        return self._pending
+
+    def start(self):
+        """Start the background export task on the running event loop."""
+        self._import_spill()
+        self._pending = self.store.count_after(self.store.exported_id())
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background task and export everything still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Export pending entries, one ``append_rows`` per month and batch."""
+        # The background task and stop() must not export the same entries twice
+        async with self._flush_lock:
+            await self._export()
+
+    async def _export(self):
+        last_id = self.store.exported_id()
+        while True:
+            entries = self.store.after(last_id, self.batch_size)
+            if not entries:
+                return
+            # Entries are in ID order, so each month is one contiguous run
+            month = format_timestamp(entries[0]["created_at"])[:7]
+            entries = list(
+                itertools.takewhile(lambda e: format_timestamp(e["created_at"])[:7] == month, entries)
+            )
+            try:
+                await self._run(
+                    self._append_rows, month, [sheet_row(e) for e in entries], idempotent=False
+                )
+            except Exception as e:
+                logger.error(f"Error exporting audit log, {self._pending} entries pending: {e}")
+                # Reopen the worksheet on the next attempt
+                self._worksheets.pop(month, None)
+                return
+            last_id = entries[-1]["id"]
+            self.store.set_exported_id(last_id)
+            self._pending = max(0, self._pending - len(entries))
+
+    def _append_rows(self, month, rows):
+        worksheet = self._worksheets.get(month)
+        if worksheet is None:
+            worksheet = self._open_month(month)
+            self._worksheets[month] = worksheet
+        worksheet.append_rows(rows, value_input_option="RAW")
+
+    def _open_month(self, month):
+        spreadsheet = self._open_spreadsheet()
+        title = f"Logs {month}"
+        try:
+            return spreadsheet.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = spreadsheet.add_worksheet(title, rows=1, cols=len(LOG_HEADERS))
+            worksheet.append_row(LOG_HEADERS)
+            return worksheet
+
+    def _import_spill(self):
+        """Move rows left in the spill file of the former sheet-only writer into the store."""
+        if not self.spill_file or not os.path.exists(self.spill_file):
+            return
+        with open(self.spill_file) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for timestamp, username, user_id, message_type, content, handler in rows:
+            created_at = datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()
+            self.store.add(
+                {
+                    "created_at": created_at,
+                    "username": username,
+                    "user_id": user_id,
+                    "type": message_type,
+                    "content": content,
+                    "handler": handler,
+                }
+            )
+        os.remove(self.spill_file)
+        logger.info(f"Imported {len(rows)} audit rows from {self.spill_file}")
@@ -0,0 +1,43 @@
+from googleapiclient.errors import HttpError
+
+from rate_limiter import classify_error
+
+# Maximum number of calls per BatchHttpRequest envelope
+DIRECTORY_BATCH_LIMIT = 1000
+# Gmail accepts 100 calls per batch but recommends no more than 50
+GMAIL_BATCH_LIMIT = 50
+
+
+def execute_batch(service, requests, batch_size):
+    """Execute ``(key, request)`` pairs in batches of ``batch_size``.
+
+    Returns a dict mapping each key to ``(response, error)``; exactly one of
+    the two is None. Blocking, so run it through the Google API executor.
+    """
+    results = {}
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start : start + batch_size]
+        keys = {}
+
+        def callback(request_id, response, exception):
+            results[keys[request_id]] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for index, (key, request) in enumerate(chunk):
+            request_id = str(start + index)
+            keys[request_id] = key
+            batch.add(request, request_id=request_id)
+        batch.execute()
+    return results
+
+
+def error_reason(error):
+    """Return a short, human readable reason for a failed batch item."""
+    if isinstance(error, HttpError):
+        reason = error._get_reason() if hasattr(error, "_get_reason") else str(error)
+    else:
+        reason = str(error)
+    if classify_error(error)[0] == "throttled":
+        # Nothing was changed, so the same command can simply be sent again
+        reason += " (rate limited, try again later)"
+    return reason
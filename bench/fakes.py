@@ -0,0 +1,360 @@
+import collections
+import random
+import threading
+import time
+import types
+
+import gspread
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class FakeApi:
+    """Shared call counters, latency and error injection for one fake API."""
+
+    def __init__(self, name, latency=0.0, error_rate=0.0, seed=None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, method, func):
+        with self._lock:
+            self.calls[method] += 1
+            throttled = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise HttpError(
+                httplib2.Response({"status": 429}),
+                b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}',
+            )
+        return func()
+
+
+class FakeRequest:
+    """Mimics a googleapiclient HttpRequest."""
+
+    def __init__(self, api, method, func):
+        self._api = api
+        self._method = method
+        self._func = func
+
+    def execute(self, http=None, num_retries=0):
+        return self._api.call(self._method, self._func)
+
+
+class FakeBatch:
+    """Mimics BatchHttpRequest: one envelope, one callback per request."""
+
+    def __init__(self, api, callback):
+        self._api = api
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request_id, request))
+
+    def execute(self, http=None):
+        def run():
+            for request_id, request in self._requests:
+                try:
+                    response = request._func()
+                    self._callback(request_id, response, None)
+                except HttpError as e:
+                    self._callback(request_id, None, e)
+
+        self._api.call("batch", run)
+
+
+def _not_found():
+    return HttpError(
+        httplib2.Response({"status": 404}),
+        b'{"error": {"errors": [{"reason": "notFound"}]}}',
+    )
+
+
+class FakeDirectory:
+    """In-memory Directory API with users list/get/insert/update and batches."""
+
+    def __init__(self, api, user_count=1000, domain="example.com"):
+        self.api = api
+        self.domain = domain
+        self.users_by_email = {}
+        for i in range(user_count):
+            email = f"user{i:05d}@{domain}"
+            self.users_by_email[email] = {
+                "primaryEmail": email,
+                "name": {"givenName": "User", "familyName": f"{i:05d}"},
+                "suspended": i % 10 == 0,
+                "orgUnitPath": "/Staff" if i % 2 else "/",
+                "creationTime": "2023-01-01T00:00:00.000Z",
+                "lastLoginTime": "2024-06-01T12:00:00.000Z" if i % 3 else "1970-01-01T00:00:00.000Z",
+                "recoveryEmail": f"user{i}@personal.example",
+                "aliases": [f"alias{i:05d}@{domain}"] if i % 4 == 0 else [],
+                "nonEditableAliases": [f"user{i:05d}@{domain.split('.')[0]}.test-google-a.com"],
+                "etag": "1",
+            }
+        self._lock = threading.Lock()
+
+    def users(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self.api, callback)
+
+    def list(self, customer=None, domain=None, orderBy=None, projection=None,
+             pageToken=None, maxResults=100, fields=None, query=None, viewType=None,
+             showDeleted=None):
+        def run():
+            emails = sorted(self.users_by_email)
+            if query and "isSuspended=true" in query:
+                emails = [e for e in emails if self.users_by_email[e]["suspended"]]
+            start = int(pageToken or 0)
+            page = emails[start : start + maxResults]
+            result = {"users": [dict(self.users_by_email[e]) for e in page]}
+            if start + maxResults < len(emails):
+                result["nextPageToken"] = str(start + maxResults)
+            return result
+
+        return FakeRequest(self.api, "users.list", run)
+
+    def get(self, userKey=None, **kwargs):
+        def run():
+            if userKey not in self.users_by_email:
+                raise _not_found()
+            return dict(self.users_by_email[userKey])
+
+        return FakeRequest(self.api, "users.get", run)
+
+    def insert(self, body=None, **kwargs):
+        def run():
+            with self._lock:
+                email = body["primaryEmail"]
+                if email in self.users_by_email:
+                    raise HttpError(
+                        httplib2.Response({"status": 409}),
+                        b'{"error": {"errors": [{"reason": "duplicate"}]}}',
+                    )
+                user = {k: v for k, v in body.items() if k != "password"}
+                user.update(
+                    suspended=False,
+                    orgUnitPath="/",
+                    creationTime="2024-06-01T00:00:00.000Z",
+                    lastLoginTime="1970-01-01T00:00:00.000Z",
+                    etag="1",
+                )
+                self.users_by_email[email] = user
+                return dict(user)
+
+        return FakeRequest(self.api, "users.insert", run)
+
+    def update(self, userKey=None, body=None, **kwargs):
+        def run():
+            with self._lock:
+                if userKey not in self.users_by_email:
+                    raise _not_found()
+                user = self.users_by_email[userKey]
+                user.update({k: v for k, v in body.items() if k != "password"})
+                user["etag"] = str(int(user["etag"]) + 1)
+                return dict(user)
+
+        return FakeRequest(self.api, "users.update", run)
+
+
+class FakeGmail:
+    """Gmail API that accepts every message."""
+
+    def __init__(self, api):
+        self.api = api
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self.api, callback)
+
+    def send(self, userId=None, body=None):
+        def run():
+            with self._lock:
+                self.sent.append(body)
+                return {"id": str(len(self.sent))}
+
+        return FakeRequest(self.api, "messages.send", run)
+
+    def getProfile(self, userId=None):
+        return FakeRequest(self.api, "getProfile", lambda: {"emailAddress": "me@example.com"})
+
+
+class FakeWorksheet:
+    """The parts of a gspread Worksheet that the bot uses."""
+
+    def __init__(self, api, title="Sheet1", rows=None):
+        self.api = api
+        self.title = title
+        self.id = 0
+        self.rows = [list(row) for row in rows or []]
+        self.spreadsheet = types.SimpleNamespace(
+            id="fake-spreadsheet", title=title, values_get=self.values_get
+        )
+        self._lock = threading.Lock()
+
+    def _call(self, method, func):
+        return self.api.call(method, func)
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        def run():
+            with self._lock:
+                self.rows.extend(list(row) for row in values)
+
+        return self._call("append_rows", run)
+
+    def get_all_values(self):
+        return self._call("get_all_values", lambda: [list(row) for row in self.rows])
+
+    def get(self, range_name=None, **kwargs):
+        # Only the start row of "A<row>:G" style ranges is honoured
+        start = 1
+        if range_name:
+            digits = "".join(c for c in range_name.split(":")[0] if c.isdigit())
+            start = int(digits or 1)
+        return self._call("get", lambda: [list(row) for row in self.rows[start - 1 :]])
+
+    def batch_update(self, data, **kwargs):
+        # Only single-cell "B<row>" style ranges are supported
+        def run():
+            with self._lock:
+                for item in data:
+                    column = ord(item["range"][0]) - ord("A")
+                    row = self.rows[int(item["range"][1:]) - 1]
+                    row.extend([""] * (column + 1 - len(row)))
+                    row[column] = item["values"][0][0]
+
+        return self._call("batch_update", run)
+
+    def acell(self, label):
+        return self._call(
+            "acell", lambda: types.SimpleNamespace(value=self.rows[0][0] if self.rows else "")
+        )
+
+    def values_get(self, range_name, **kwargs):
+        return self._call("values_get", lambda: {"values": [list(row) for row in self.rows]})
+
+
+class FakeSpreadsheet:
+    """A spreadsheet of FakeWorksheets, opened and added by title."""
+
+    def __init__(self, api, title="Spreadsheet"):
+        self.api = api
+        self.title = title
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=1, cols=1):
+        self.worksheets[title] = FakeWorksheet(self.api, title)
+        return self.worksheets[title]
+
+
+class FakeClients:
+    """Drop-in replacement for GoogleClients backed by the fakes above."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, user_count=1000, seed=1):
+        self.apis = {
+            "directory": FakeApi("directory", latency, error_rate, seed),
+            "gmail": FakeApi("gmail", latency, error_rate, seed),
+            "sheets": FakeApi("sheets", latency, error_rate, seed),
+        }
+        self.directory = FakeDirectory(self.apis["directory"], user_count)
+        self.gmail = FakeGmail(self.apis["gmail"])
+        self.accounts_sheet = FakeWorksheet(self.apis["sheets"], "Accounts")
+        self.log_spreadsheet = FakeSpreadsheet(self.apis["sheets"], "Logs")
+        self.sheets = None
+        self.settings = {
+            "customer": "my_customer",
+            "admin_account": "admin@example.com",
+            "sender_address": "noreply@example.com",
+        }
+        self.timings = {}
+
+    def warm_up(self):
+        pass
+
+    def call_counts(self):
+        """Return a flat ``{"api.method": count}`` snapshot."""
+        return {
+            f"{name}.{method}": count
+            for name, api in self.apis.items()
+            for method, count in api.calls.items()
+        }
+
+
+class FakeMessage:
+    """Enough of telegram.Message for the handlers."""
+
+    def __init__(self, text, username, chat_id, document=None, caption=None):
+        self.text = text
+        self.caption = caption
+        self.document = document
+        self.from_user = types.SimpleNamespace(username=username, id=chat_id)
+        self.chat = types.SimpleNamespace(id=chat_id)
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return FakeSentMessage(text)
+
+    async def reply_document(self, document, **kwargs):
+        self.replies.append(f"<document {kwargs.get('filename')}>")
+        return FakeSentMessage("")
+
+
+class FakeSentMessage:
+    def __init__(self, text):
+        self.text = text
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+
+
+class FakeBot:
+    """Telegram Bot stand-in that records what the bot sends."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+        return FakeSentMessage(text)
+
+    async def get_me(self):
+        return types.SimpleNamespace(username="fake_bot")
+
+
+def make_update(text, username="admin", chat_id=1000, update_id=0):
+    """Build a synthetic Telegram update and the matching handler context."""
+    message = FakeMessage(text, username, chat_id)
+    update = types.SimpleNamespace(
+        update_id=update_id,
+        message=message,
+        effective_message=message,
+        effective_user=message.from_user,
+        effective_chat=message.chat,
+        callback_query=None,
+    )
+    args = text.split()[1:] if text.startswith("/") else None
+    context = types.SimpleNamespace(args=args, bot=FakeBot(), error=None)
+    return update, context
@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the repository root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fakes import FakeBot, FakeClients, make_update
+
+
+def configure_environment(data_dir, real_limits):
+    """Point the bot at local files and, unless asked, lift the API rate limits."""
+    os.environ.setdefault("BOT_ALLOWED_USERS", "admin")
+    os.environ.setdefault("BOT_PROTECTED_ACCOUNTS", "admin@example.com")
+    os.environ.setdefault("GWORKSPACE_ADMIN_ACCOUNT", "admin@example.com")
+    os.environ.setdefault("GMAIL_SENDER_ADDRESS", "noreply@example.com")
+    os.environ["DIRECTORY_CACHE_DB"] = ""
+    os.environ["PROVISIONING_DB"] = os.path.join(data_dir, "provisioning.sqlite3")
+    os.environ["MAIL_OUTBOX_DB"] = os.path.join(data_dir, "mail_outbox.sqlite3")
+    os.environ["ACCOUNTS_MIRROR_DB"] = os.path.join(data_dir, "accounts_mirror.sqlite3")
+    os.environ["AUDIT_LOG_SPILL_FILE"] = os.path.join(data_dir, "audit_log_spill.jsonl")
+    os.environ["AUDIT_LOG_DB"] = os.path.join(data_dir, "audit_log.sqlite3")
+    os.environ["TENANTS_DB"] = os.path.join(data_dir, "tenants.sqlite3")
+    if not real_limits:
+        for api in ("DIRECTORY", "GMAIL", "SHEETS"):
+            os.environ[f"GOOGLE_API_{api}_RATE"] = "100000"
+            os.environ[f"GOOGLE_API_{api}_BURST"] = "100000"
+        os.environ["GOOGLE_API_MAX_RETRIES"] = "0"
+        os.environ["MAIL_RATE"] = "100000"
+        # Failed emails are retried within the run instead of a minute later
+        os.environ["MAIL_RETRY_DELAY"] = "0.05"
+
+
+def letters(i):
+    """Spell a number with letters, as names may not contain digits."""
+    return "".join("abcdefghij"[int(digit)] for digit in str(i))
+
+
+# Command text for the i-th request of each scenario
+SCENARIOS = {
+    "handle_message": lambda i: (
+        f"Hi team\nNew Person{letters(i)}\nnew{i}@example.com\nnew{i}@personal.example\nBenchmark"
+    ),
+    "add_user": lambda i: (
+        f"/adduser Add{i} Person{i} add{i}@example.com add{i}@personal.example Benchmark"
+    ),
+    "list_users": lambda i: "/listusers --live",
+    "reset_password": lambda i: f"/resetpw user{i % 500 + 1:05d}@example.com",
+    "health": lambda i: "/health",
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_scenario(bot, clients, name, requests, concurrency):
+    """Drive one handler with synthetic updates and collect its numbers."""
+    handler = getattr(bot, name)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    calls_before = clients.call_counts()
+    notifications_before = len(bot_notifications.sent)
+
+    async def one(i):
+        nonlocal errors
+        update, context = make_update(SCENARIOS[name](i), update_id=i)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await handler(update, context)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    # Provisioning handlers return before the account exists, so also wait until
+    # every job has emailed its credentials or failed
+    jobs_elapsed = None
+    if name in ("handle_message", "add_user"):
+        while sum(
+            text.startswith(("📧", "❌"))
+            for _, text in bot_notifications.sent[notifications_before:]
+        ) < requests:
+            await asyncio.sleep(0.01)
+        jobs_elapsed = time.perf_counter() - started
+
+    calls_after = clients.call_counts()
+    api_calls = {
+        key: round((calls_after[key] - calls_before.get(key, 0)) / requests, 2)
+        for key in sorted(calls_after)
+        if calls_after[key] != calls_before.get(key, 0)
+    }
+    return {
+        "command": name,
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "jobs_done_s": round(jobs_elapsed, 2) if jobs_elapsed is not None else None,
+        "api_calls_per_request": api_calls,
+    }
+
+
+bot_notifications = FakeBot()
+
+
+async def main(args):
+    data_dir = tempfile.mkdtemp(prefix="bot-bench-")
+    configure_environment(data_dir, args.real_limits)
+    import bot
+
+    clients = FakeClients(
+        latency=args.latency / 1000, error_rate=args.error_rate, user_count=args.users
+    )
+    bot.google_clients = clients
+    bot.audit_log.start()
+    bot.provisioning.start(bot_notifications.send_message)
+    bot.mail_outbox.start(bot_notifications.send_message)
+    bot.health_monitor.add_probe("telegram", bot_notifications.get_me)
+    await bot.health_monitor.check()
+    if args.cache:
+        await bot.directory_cache.refresh()
+
+    results = []
+    for name in args.commands:
+        results.append(
+            await run_scenario(bot, clients, name, args.requests, args.concurrency)
+        )
+
+    await bot.provisioning.stop()
+    await bot.mail_outbox.stop()
+    await bot.audit_log.stop()
+    bot.google_api.shutdown()
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the bot handlers against local fakes of the Google and Telegram APIs."
+    )
+    parser.add_argument("--requests", type=int, default=200, help="requests per command")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=20, help="fake API latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--users", type=int, default=2000, help="users in the fake directory")
+    parser.add_argument("--cache", action="store_true", help="fill the directory cache first")
+    parser.add_argument("--real-limits", action="store_true", help="keep the configured API rate limits and retries")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument(
+        "commands", nargs="*", metavar="command",
+        help=f"commands to run (default: all of {', '.join(SCENARIOS)})",
+    )
+    args = parser.parse_args()
+    for name in args.commands:
+        if name not in SCENARIOS:
+            parser.error(f"unknown command {name}")
+    args.commands = args.commands or list(SCENARIOS)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(main(args))
+
+    from tabulate import tabulate
+
+    print(
+        tabulate(
+            [
+                [
+                    r["command"],
+                    r["requests"],
+                    r["errors"],
+                    r["throughput"],
+                    r["p50_ms"],
+                    r["p99_ms"],
+                    r["jobs_done_s"] if r["jobs_done_s"] is not None else "",
+                    ", ".join(f"{k}={v}" for k, v in r["api_calls_per_request"].items()),
+                ]
+                for r in results
+            ],
+            headers=["Command", "Requests", "Errors", "Req/s", "p50 ms", "p99 ms", "Jobs done s", "API calls per request"],
+            tablefmt="simple",
+        )
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
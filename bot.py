@@ -3,128 +3,243 @@ import json
 import datetime
 import random
 import string
-from telegram import Update, Bot
+from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
     CallbackContext,
 )
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
 from googleapiclient.errors import HttpError
 import os.path
 import base64
 import google.auth
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from email.mime.text import MIMEText
 import os
 from dotenv import load_dotenv
-from tabulate import tabulate
 from functools import wraps
+from tabulate import tabulate
 import inspect
-import logging.handlers
+import csv
+import io
+import time
+import asyncio
+import collections
+import html
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from telegram.error import TelegramError
+from audit_log import AUDIT_USAGE, AuditLogWriter, AuditStore, format_entry, parse_audit_args
+from google_clients import GoogleClients
+from google_executor import GoogleExecutor
+from google_transport import TokenCache
+from tenants import TenantRegistry
+from rate_limiter import ApiGuard, CircuitOpenError, classify_error
+from provisioning_queue import STEPS, ProvisioningQueue, StepError
+from mail_outbox import MailOutbox
+from health_monitor import HealthMonitor
+import metrics
+from logging_setup import correlate, setup_logging
+from directory_cache import DirectoryCache
+from single_flight import SingleFlight
+from accounts_mirror import AccountsMirror
+from message_parser import FORMAT_HINT, parse_people
+from bulk_onboarding import Pacer, read_csv, validate_rows
+from inactive_sweep import COHORTS, classify_users, render_report
+from reconcile import CHANGES, STATUS_COLUMN, SUSPENDED, plan_changes, render_plan
+from user_listing import (
+    PAGE_SIZE,
+    build_matcher,
+    build_query,
+    parse_list_args,
+    render_page,
+)
+from user_export import UserExport, parse_columns
+from batch_requests import (
+    DIRECTORY_BATCH_LIMIT,
+    GMAIL_BATCH_LIMIT,
+    execute_batch,
+    error_reason,
+)
 
+STARTED_AT = time.monotonic()
 load_dotenv()
 
-# Setup logging
-#logging.basicConfig(
-#    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-#)
-#logger = logging.getLogger(__name__)
+log_listener = setup_logging()
+logger = logging.getLogger(__name__)
 
-def setup_logging():
-    """Setup logging configuration"""
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
 
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+def api_guard(name, rate, burst):
+    """Build the rate limiter and retry policy for one API from the environment."""
+    prefix = f"GOOGLE_API_{name.upper()}"
+    return ApiGuard(
+        name,
+        rate=float(os.getenv(f"{prefix}_RATE", rate)),
+        burst=int(os.getenv(f"{prefix}_BURST", burst)),
+        max_retries=int(os.getenv("GOOGLE_API_MAX_RETRIES", "5")),
+        breaker_threshold=int(os.getenv("GOOGLE_API_BREAKER_THRESHOLD", "5")),
+        breaker_cooldown=float(os.getenv("GOOGLE_API_BREAKER_COOLDOWN", "30")),
     )
-    console_handler.setFormatter(console_format)
 
-    # File handler with rotation
-    file_handler = logging.handlers.RotatingFileHandler(
-        'bot.log',
-        maxBytes=1024 * 1024,  # 1MB
-        backupCount=5
-    )
-    file_handler.setLevel(logging.INFO)
-    file_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(file_format)
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+# Threads for blocking Google API calls and access tokens, shared by all tenants
+google_api_pool = ThreadPoolExecutor(
+    int(os.getenv("GOOGLE_API_MAX_WORKERS", "8")), thread_name_prefix="google-api"
+)
+token_cache = TokenCache()
+
+
+def build_tenant(tenant):
+    """Build the Google clients, API limits and caches of one tenant.
+
+    Each tenant gets its own quotas, circuit breakers and caches, while the
+    worker threads are shared by all tenants.
+    """
+    return {
+        "clients": GoogleClients(
+            tenant.settings,
+            token_cache,
+            pool_size=int(os.getenv("GOOGLE_API_SHEETS_CONCURRENCY", "2")),
+        ),
+        "api": GoogleExecutor(
+            limits={
+                "directory": int(os.getenv("GOOGLE_API_DIRECTORY_CONCURRENCY", "4")),
+                "gmail": int(os.getenv("GOOGLE_API_GMAIL_CONCURRENCY", "2")),
+                "sheets": int(os.getenv("GOOGLE_API_SHEETS_CONCURRENCY", "2")),
+            },
+            guards={
+                "directory": api_guard("directory", "20", "20"),
+                "gmail": api_guard("gmail", "5", "10"),
+                "sheets": api_guard("sheets", "1", "5"),
+            },
+            on_call=metrics.observe_api_call,
+            pool=google_api_pool,
+        ),
+        "directory_cache": DirectoryCache(
+            fetch_users_page,
+            fetch_user,
+            db_path=tenant.path(os.getenv("DIRECTORY_CACHE_DB")) or None,
+        ),
+        # Identical reads sent by several admins at once share one Directory
+        # API call, and the result is reused for a few seconds. Dropped when
+        # the bot adds or suspends users so that listings show the change.
+        "directory_reads": SingleFlight(ttl=float(os.getenv("READ_COALESCING_TTL", "5"))),
+        "accounts_mirror": AccountsMirror(
+            fetch_account_rows,
+            db_path=tenant.path(os.getenv("ACCOUNTS_MIRROR_DB", "data/accounts_mirror.sqlite3")),
+            full_sync_interval=int(os.getenv("ACCOUNTS_MIRROR_FULL_SYNC_INTERVAL", "86400")),
+        ),
+    }
+
+
+# The default tenant comes from the variables above, more from TENANTS_FILE
+tenants = TenantRegistry(
+    build_tenant,
+    config_file=os.getenv("TENANTS_FILE") or None,
+    db_path=os.getenv("TENANTS_DB", "data/tenants.sqlite3"),
+)
+
+# Components of the tenant the current update or job works on
+google_clients = tenants.proxy("clients")
+google_api = tenants.proxy("api")
+directory_cache = tenants.proxy("directory_cache")
+directory_reads = tenants.proxy("directory_reads")
+accounts_mirror = tenants.proxy("accounts_mirror")
 
-    return logger
 
-logger = setup_logging()
+async def run_on_default_tenant(func, *args, idempotent=True):
+    """Run a blocking Sheets call with the default tenant's clients."""
+    with tenants.activate(None):
+        return await google_api.run("sheets", func, *args, idempotent=idempotent)
 
 
-# Google Sheets API configuration
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-]
-CREDS = ServiceAccountCredentials.from_json_keyfile_name(
-    os.getenv("GWORKSPACE_CREDS_FILE"), SCOPE
+# One audit log for the whole bot, exported to the default tenant's logs spreadsheet
+audit_log = AuditLogWriter(
+    AuditStore(os.getenv("AUDIT_LOG_DB", "data/audit_log.sqlite3")),
+    lambda: google_clients.log_spreadsheet,
+    run=run_on_default_tenant,
+    spill_file=os.getenv("AUDIT_LOG_SPILL_FILE", "data/audit_log_spill.jsonl"),
+    batch_size=int(os.getenv("AUDIT_LOG_BATCH_SIZE", "50")),
+    flush_interval=float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "5")),
 )
-client = gspread.authorize(CREDS)
-sheet = client.open(os.getenv("SPREADSHEET_FILENAME")).sheet1
 
-# Google Workspace API configuration
-WS_SCOPES = ["https://www.googleapis.com/auth/admin.directory.user"]
-WORKSPACE_CREDS = service_account.Credentials.from_service_account_file(
-    os.getenv("GWORKSPACE_CREDS_FILE"), scopes=WS_SCOPES
+
+# Fields kept for each user in listings and in the directory cache
+DIRECTORY_USER_FIELDS = (
+    "nextPageToken,users(primaryEmail,name,suspended,isAdmin,lastLoginTime,"
+    "creationTime,recoveryEmail,orgUnitPath,aliases,nonEditableAliases,isEnrolledIn2Sv,"
+    "isEnforcedIn2Sv,etag)"
 )
-delegatedCreds = WORKSPACE_CREDS.with_subject(os.getenv("GWORKSPACE_ADMIN_ACCOUNT"))
-service = build("admin", "directory_v1", credentials=delegatedCreds)
 
 
-# Google Mail API configuration
-GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+async def fetch_users_page(page_token=None, query=None, max_results=500):
+    """Fetch one page of the domain's users from the Directory API."""
+    return await google_api.run(
+        "directory",
+        lambda: google_clients.directory.users()
+        .list(
+            customer=google_clients.settings["customer"],
+            orderBy="email",
+            projection="full",
+            pageToken=page_token,
+            maxResults=max_results,  # 500 is the maximum allowed by the API
+            fields=DIRECTORY_USER_FIELDS,
+            query=query,
+        )
+        .execute(),
+    )
+
+
+async def fetch_ou_emails(org_unit_path):
+    """Return the primary emails of all users in an organizational unit."""
+    emails = []
+    page_token = None
+    while True:
+        results = await fetch_users_page(page_token, query=f"orgUnitPath='{org_unit_path}'")
+        emails.extend(user["primaryEmail"] for user in results.get("users", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return emails
 
-creds = None
-if os.path.exists(os.getenv("GMAIL_TOKEN_FILE")):
-    creds = Credentials.from_authorized_user_file(
-        os.getenv("GMAIL_TOKEN_FILE"), GMAIL_SCOPES
+
+async def fetch_user(email):
+    """Fetch a single user from the Directory API."""
+    return await google_api.run(
+        "directory", lambda: google_clients.directory.users().get(userKey=email).execute()
     )
-if not creds or not creds.valid:
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    else:
-        flow = InstalledAppFlow.from_client_secrets_file(
-            os.getenv("GMAIL_CREDENTIALS_FILE"), GMAIL_SCOPES
-        )
-        creds = flow.run_local_server(port=0)
-    with open(os.getenv("GMAIL_TOKEN_FILE"), "w") as token:
-        token.write(creds.to_json())
 
-gmail_service = build("gmail", "v1", credentials=creds)
 
-try:
-    # Trying to open log sheet
-    log_sheet = client.open(os.getenv("LOGS_SHEET_FILENAME")).sheet1
-except Exception as e:
-    # If it is not exists, trying to create it
-    log_spreadsheet = client.create(os.getenv("LOGS_SHEET_FILENAME"))
-    log_sheet = log_spreadsheet.sheet1
+# Directory API page size used when streaming live listings
+LIST_API_PAGE_SIZE = 100
+
+# Server-side /listusers cursors for the inline navigation buttons
+MAX_LIST_CURSORS = 200
+list_cursors = collections.OrderedDict()
+
+
+def append_account_rows(rows):
+    """Append rows to the accounts sheet (blocking, run through google_api)."""
+    google_clients.accounts_sheet.append_rows(rows, table_range="A165")
+
+
+def read_account_rows(start_row):
+    """Read the accounts sheet from a row to the end (blocking, run through google_api)."""
+    try:
+        return google_clients.accounts_sheet.get(f"A{start_row}:G")
+    except gspread.exceptions.APIError as e:
+        # Nothing was added after the last row read
+        if "exceeds grid limits" in str(e):
+            return []
+        raise
+
+
+async def fetch_account_rows(start_row):
+    return await google_api.run("sheets", read_account_rows, start_row)
 
-    # Setting headers
-    headers = ["Timestamp", "Username", "User ID", "Type", "Content", "Handler"]
-    log_sheet.append_row(headers)
 
 
 def create_message(sender, to, subject, message_text, reply_to=None):
@@ -138,16 +253,30 @@ def create_message(sender, to, subject, message_text, reply_to=None):
     return {"raw": raw_message.decode()}
 
 
-def send_message(service, user_id, message):
-    try:
-        message = (
-            service.users().messages().send(userId=user_id, body=message).execute()
-        )
-        print(f'Message Id: {message["id"]}')
-        return message
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+async def send_mail_batch(items, tenant):
+    """Send ``(id, message)`` pairs from the mail outbox in Gmail batch requests."""
+
+    def send_all():
+        gmail = google_clients.gmail
+        requests = [
+            (key, gmail.users().messages().send(userId="me", body=message))
+            for key, message in items
+        ]
+        return execute_batch(gmail, requests, GMAIL_BATCH_LIMIT)
+
+    with tenants.activate(tenant):
+        return await google_api.run("gmail", send_all, idempotent=False)
+
+
+mail_outbox = MailOutbox(
+    os.getenv("MAIL_OUTBOX_DB", "data/mail_outbox.sqlite3"),
+    send_mail_batch,
+    rate=float(os.getenv("MAIL_RATE", "2")),
+    workers=int(os.getenv("MAIL_WORKERS", "2")),
+    batch_size=min(int(os.getenv("MAIL_BATCH_SIZE", "20")), GMAIL_BATCH_LIMIT),
+    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", "5")),
+    retry_delay=float(os.getenv("MAIL_RETRY_DELAY", "60")),
+)
 
 
 BOT_PROTECTED_ACCOUNTS = os.getenv("BOT_PROTECTED_ACCOUNTS").split(",")
@@ -159,34 +288,63 @@ def is_authorized(username):
     return username in BOT_ALLOWED_USERS
 
 
+async def reply_in_chunks(message, text, **kwargs):
+    """Reply with text split at line boundaries to fit Telegram's message limit."""
+    chunk = ""
+    for line in text.split("\n"):
+        if chunk and len(chunk) + len(line) + 1 > 4000:
+            await message.reply_text(chunk, **kwargs)
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        await message.reply_text(chunk, **kwargs)
+
+
+async def reply_with_passwords(message, lines):
+    """Reply with HTML lines that show new passwords, as plain text if Telegram rejects them.
+
+    The passwords are already changed, so the admin must see them either way.
+    """
+    try:
+        await reply_in_chunks(message, "\n".join(lines), parse_mode="HTML")
+    except TelegramError as e:
+        logger.error(f"Error sending new passwords as HTML, sending plain text: {e}")
+        plain = [html.unescape(re.sub(r"</?code>", "", line)) for line in lines]
+        await reply_in_chunks(message, "\n".join(plain))
+
+
 def log_to_sheet(func):
-    """Decorator for logging messages to Google Spreadsheet."""
+    """Decorator for logging messages to the audit log (exported to Google Spreadsheet)."""
 
     @wraps(func)
     async def wrapper(update: Update, context: CallbackContext, *args, **kwargs):
         try:
-            # Getting log sheet
-            log_sheet = client.open(os.getenv("LOGS_SHEET_FILENAME")).sheet1
-
             # Collecting message information
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             username = update.effective_user.username
             user_id = update.effective_user.id
 
             # Determining message type (command or text)
-            if update.message.text.startswith("/"):
+            text = update.message.text or update.message.caption or ""
+            if text.startswith("/"):
                 message_type = "command"
-                content = update.message.text
+                content = text
             else:
                 message_type = "message"
-                content = update.message.text
+                content = text
 
             # Getting handler name
             handler_name = func.__name__
 
-            # Writing to the sheet
-            log_sheet.append_row(
-                [timestamp, username, str(user_id), message_type, content, handler_name]
+            # Stored locally, exported by the background writer
+            audit_log.enqueue(
+                {
+                    "username": username,
+                    "user_id": str(user_id),
+                    "type": message_type,
+                    "content": content,
+                    "handler": handler_name,
+                    "tenant": tenants.current().name,
+                }
             )
 
         except Exception as e:
@@ -200,6 +358,23 @@ def log_to_sheet(func):
     return wrapper
 
 
+def log_callback(update: Update, handler_name, content):
+    """Record a button press, such as a sweep confirmation, in the audit log."""
+    try:
+        audit_log.enqueue(
+            {
+                "username": update.effective_user.username,
+                "user_id": str(update.effective_user.id),
+                "type": "callback",
+                "content": content,
+                "handler": handler_name,
+                "tenant": tenants.current().name,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error logging to sheet: {e}")
+
+
 @log_to_sheet
 async def start(update: Update, context: CallbackContext) -> None:
     """Send a welcome message and instructions when the /start command is issued."""
@@ -213,100 +388,17 @@ async def start(update: Update, context: CallbackContext) -> None:
 
 @log_to_sheet
 async def handle_message(update: Update, context: CallbackContext) -> None:
-    """Handle incoming messages and process the user information."""
+    """Handle incoming messages and process the user information.
+
+    One message may hold any number of people; see ``parse_people``.
+    """
     if not is_authorized(update.message.from_user.username):
         return
-    try:
-        # Remove the introductory part of the message
-        text = update.message.text
-        if "Hey" in text or "Hi" in text:
-            text = text.split("\n", 1)[1].strip()
-
-        if "We need" in text or "new member" in text:
-            text = text.split("\n", 1)[1].strip()
-
-        print(text)
-        # Parse the remaining message
-        text_lines = text.split("\n")
-        if len(text_lines) < 4:
-            await update.message.reply_text(
-                "I couldn't understand your message. Plaese send me a message in the format:\nName Surname\nDesired email\nExisting email\nComment"
-            )
-            return
-
-        first_name, last_name = text_lines[0].split()
-        desired_email = text_lines[1]
-        secondary_email = text_lines[2]
-        comment = (
-            text_lines[3] + " " + text_lines[4]
-            if len(text_lines) > 4
-            else text_lines[3]
-        )  # Handle multi-line comments
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        username = update.message.from_user.username
-
-        # Add data to Google Sheet
-        try:
-            sheet.append_row(
-                [
-                    desired_email.strip(),
-                    "",
-                    first_name + " " + last_name,
-                    comment,
-                    secondary_email,
-                    timestamp,
-                    username,
-                ],
-                table_range="A165",
-            )
-        except gspread.exceptions.APIError as e:
-            logger.error(f"Error addind data to Google Sheet: {e}")
-            await update.message.reply_text(
-                "There is a problem with adding to Google Sheet. Please try again later."
-            )
-            return
-
-        password = generate_random_password()
-
-        # Create a new user in Google Workspace
-        user_info = {
-            "primaryEmail": desired_email,
-            "name": {"givenName": first_name, "familyName": last_name},
-            "password": password,
-            "changePasswordAtNextLogin": True,
-            "recoveryEmail": secondary_email,
-        }
-
-        # Uncomment the next line to enable user creation in Google Workspace
-        try:
-            service.users().insert(body=user_info).execute()
-        except HttpError as e:
-            logger.error(f"There is an error creating user in Google Workspace: {e}")
-            await update.message.reply_text(
-                "There is an error creating user in Google Workspace. Please try again later."
-            )
-
-        # Send email with user credentials
-        message_text = generate_email_text(
-            first_name, last_name, desired_email, password
-        )
-        message = create_message(
-            os.getenv("GMAIL_SENDER_ADDRESS"),
-            secondary_email,
-            "Access Details for Google Workspace Account",
-            message_text,
-            reply_to=os.getenv("GWORKSPACE_ADMIN_ACCOUNT"),
-        )
-
-        # Uncomment the next line to enable sending email with user credentials in Google Workspace
-        send_message(gmail_service, "me", message)
-
-        await update.message.reply_text(
-            f"The account for {first_name} {last_name} has been created."
-        )
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        await update.message.reply_text(f"Error. Please verify your input. {e}")
+    people, errors = parse_people(update.message.text)
+    if not people and not errors:
+        await update.message.reply_text(f"I couldn't understand your message. {FORMAT_HINT}")
+        return
+    await submit_provisioning(update, people, errors)
 
 
 def generate_random_password(length=12):
@@ -351,76 +443,374 @@ async def add_user(update: Update, context: CallbackContext) -> None:
             )
             return
 
-        first_name = args[0]
-        last_name = args[1]
-        desired_email = args[2]
-        secondary_email = args[3]
-        comment = " ".join(args[4:]) if len(args) > 4 else ""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        username = update.message.from_user.username
+        person = {
+            "first_name": args[0],
+            "last_name": args[1],
+            "desired_email": args[2].strip(),
+            "secondary_email": args[3],
+            "comment": " ".join(args[4:]) if len(args) > 4 else "",
+        }
+        await submit_provisioning(update, [person])
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        await update.message.reply_text(f"Error. Please verify your input. {e}")
 
-        # Add data to Google Sheet
-        try:
-            sheet.append_row(
-                [
-                    desired_email.strip(),
-                    "",
-                    first_name + " " + last_name,
-                    comment,
-                    secondary_email,
-                    timestamp,
-                    username,
-                ],
-                table_range="A165",
+
+def account_row(person):
+    """Return the accounts sheet row for a provisioning request."""
+    return [
+        person["desired_email"],
+        "",
+        person["first_name"] + " " + person["last_name"],
+        person["comment"],
+        person["secondary_email"],
+        person["timestamp"],
+        person["requested_by"],
+    ]
+
+
+# Request fields that a retried provisioning job must not change silently
+REQUEST_DETAILS = ["first_name", "last_name", "secondary_email"]
+
+
+def free_addresses(first_name, last_name, email):
+    """Suggest free addresses in the domain of ``email`` for a person."""
+    domain = email.rsplit("@", 1)[-1]
+    return directory_cache.addresses.suggest(
+        first_name,
+        last_name,
+        domain,
+        taken=lambda address: accounts_mirror.find(address) or provisioning.find(address) is not None,
+    )
+
+
+def suggestion_text(first_name, last_name, email):
+    suggestions = free_addresses(first_name, last_name, email)
+    return f" Free: {', '.join(suggestions)}" if suggestions else ""
+
+
+async def submit_with_rows(people, chat_id, requested_by, tenant):
+    """Add the rows of new requests to Google Sheet in one call and queue their jobs.
+
+    The jobs start at the Workspace user step. Raises gspread's APIError,
+    with nothing queued, when the rows could not be added.
+    """
+    rows = [account_row(person) for person in people]
+    await google_api.run("sheets", append_account_rows, rows, idempotent=False)
+    accounts_mirror.add(rows)
+    return provisioning.submit_many(
+        people, chat_id, requested_by, start_step="workspace_user", tenant=tenant
+    )
+
+
+async def submit_provisioning(update: Update, people, errors=()) -> None:
+    """Queue provisioning jobs for a batch of people and report them in one reply.
+
+    Requests that were already made are rejected without calling any API,
+    unless they retry a failed job. Several new requests are added to Google
+    Sheet in one call, and their jobs start at the Workspace user step.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    requested_by = update.message.from_user.username
+    lines = [f"❌ Person {block}: {error}" for block, error in errors]
+    known = []
+    new = []
+    seen = set()
+    for person in people:
+        person["timestamp"] = timestamp
+        person["requested_by"] = requested_by
+        email = person["desired_email"]
+        if email.lower() in seen:
+            lines.append(f"❌ {email} appears more than once")
+            continue
+        seen.add(email.lower())
+        job = provisioning.find(email)
+        if job is not None:
+            changed = [f for f in REQUEST_DETAILS if job["payload"].get(f) != person.get(f)]
+            if job["state"] == "failed" and changed and job["step"] != STEPS[0]:
+                # The sheet row (and maybe the account) already has the earlier details
+                lines.append(
+                    f"⛔ {email}: job {job['id']} failed at {job['step']} with other details "
+                    f"({', '.join(changed)}). Correct the row in Google Sheet and run "
+                    "/reconcile, or send the original request to retry."
+                )
+                continue
+            known.append(person)
+            continue
+        existing = accounts_mirror.find(email)
+        owner = directory_cache.addresses.owner(email)
+        if existing:
+            lines.append(
+                f"⛔ {email} was already requested by {existing['requested_by'] or 'unknown'} "
+                f"on {existing['timestamp'] or 'unknown date'}."
+            )
+        elif owner:
+            taken = "already exists" if owner == email.lower() else f"is an alias of {owner}"
+            lines.append(
+                f"⛔ {email} {taken} in Google Workspace."
+                + suggestion_text(person["first_name"], person["last_name"], email)
             )
+        else:
+            new.append(person)
+
+    chat_id = update.effective_chat.id
+    tenant = tenants.current().name
+    submitted = provisioning.submit_many(known, chat_id, requested_by, tenant=tenant)
+    if len(new) == 1:
+        # A single row is written by the job, so the reply does not wait for it
+        submitted += provisioning.submit_many(new, chat_id, requested_by, tenant=tenant)
+    elif new:
+        try:
+            submitted += await submit_with_rows(new, chat_id, requested_by, tenant)
         except gspread.exceptions.APIError as e:
-            logger.error(f"Error adding to Google Sheet: {e}")
-            await update.message.reply_text(
-                "Error adding to Google Sheet. Please try again later."
+            logger.error(f"Error adding data to Google Sheet: {e}")
+            lines.append(
+                f"❌ {len(new)} requests could not be added to Google Sheet. "
+                "Send the same request again to retry."
             )
-            return
 
-        password = generate_random_password()
+    for job, is_new in submitted:
+        person = job["payload"]
+        if is_new:
+            lines.append(
+                f"✅ {person['first_name']} {person['last_name']} "
+                f"({person['desired_email']}): job {job['id']}"
+            )
+        else:
+            lines.append(
+                f"⏳ {person['desired_email']} is already handled by job "
+                f"{job['id']} ({job['state']}, step {job['step']})."
+            )
+    if any(is_new for _, is_new in submitted):
+        lines.append("\nI will report here when each account is ready.")
+    await reply_in_chunks(update.message, "\n".join(lines))
 
-        # Create a new user in Google Workspace
-        user_info = {
-            "primaryEmail": desired_email,
-            "name": {"givenName": first_name, "familyName": last_name},
-            "password": password,
-            "changePasswordAtNextLogin": True,
-            "recoveryEmail": secondary_email,
-        }
 
-        try:
-            service.users().insert(body=user_info).execute()
-        except HttpError as e:
-            logger.error(f"Error creating account in Google Workspace: {e}")
-            await update.message.reply_text(
-                "Error creating account in Google Workspace. Please try again later."
-            )
-            return
+async def provision_sheet_row(job):
+    """Provisioning step: add the request to Google Sheet."""
+    rows = [account_row(job["payload"])]
+    try:
+        await google_api.run("sheets", append_account_rows, rows, idempotent=False)
+        accounts_mirror.add(rows)
+    except gspread.exceptions.APIError as e:
+        logger.error(f"Error adding data to Google Sheet: {e}")
+        raise StepError(
+            "There is a problem with adding to Google Sheet. "
+            "Send the same request again to retry."
+        )
+
+
+def matches_request(user, person):
+    """Whether an existing Workspace user has the details of a provisioning request."""
+    name = user.get("name", {})
+    return (
+        name.get("givenName") == person["first_name"]
+        and name.get("familyName") == person["last_name"]
+        and (user.get("recoveryEmail") or "").lower() == person["secondary_email"].lower()
+    )
 
-        # Send email with user credentials
-        message_text = generate_email_text(
-            first_name, last_name, desired_email, password
+
+async def created_by_earlier_attempt(person):
+    """Return the user behind a 409 if an interrupted attempt created it, else None."""
+    try:
+        user = await google_api.run(
+            "directory",
+            lambda: google_clients.directory.users().get(userKey=person["desired_email"]).execute(),
         )
-        message = create_message(
-            os.getenv("GMAIL_SENDER_ADDRESS"),
-            secondary_email,
-            "Access Details for Google Workspace Account",
-            message_text,
-            reply_to=os.getenv("GWORKSPACE_ADMIN_ACCOUNT"),
+    except HttpError as e:
+        logger.error(f"Error checking existing user {person['desired_email']}: {e}")
+        return None
+    return user if matches_request(user, person) else None
+
+
+async def provision_workspace_user(job):
+    """Provisioning step: create the user in Google Workspace."""
+    person = job["payload"]
+    # Keep the password so that an interrupted job can still email it.
+    # insert_sent marks an insert whose outcome may be unknown after a restart.
+    already_sent = person.get("insert_sent", False)
+    person.setdefault("password", generate_random_password())
+    person["insert_sent"] = True
+    provisioning.save_payload(job)
+
+    user_info = {
+        "primaryEmail": person["desired_email"],
+        "name": {"givenName": person["first_name"], "familyName": person["last_name"]},
+        "password": person["password"],
+        "changePasswordAtNextLogin": True,
+        "recoveryEmail": person["secondary_email"],
+    }
+    try:
+        user = await google_api.run(
+            "directory",
+            lambda: google_clients.directory.users().insert(body=user_info).execute(),
+            idempotent=False,
         )
+    except HttpError as e:
+        user = None
+        if e.resp.status == 409 and already_sent:
+            # Created by an earlier attempt that was interrupted?
+            user = await created_by_earlier_attempt(person)
+        if user is None:
+            if e.resp.status < 500:
+                # Rejected, so nothing was created: a 409 on the next attempt is not ours
+                person["insert_sent"] = False
+                provisioning.save_payload(job)
+            else:
+                # The insert may still have gone through
+                directory_cache.invalidate(person["desired_email"])
+            logger.error(f"There is an error creating user in Google Workspace: {e}")
+            raise StepError(
+                f"There is an error creating user in Google Workspace: {error_reason(e)}"
+            )
+    # The created user is returned, its addresses are taken in the index right away
+    directory_cache.put(user)
+    directory_reads.forget()
 
-        send_message(gmail_service, "me", message)
 
+async def provision_credentials_email(job):
+    """Provisioning step: queue the credentials email to the secondary address."""
+    person = job["payload"]
+    if "outbox_id" in person:
+        # Queued by an earlier attempt that was interrupted
+        return
+    message_text = generate_email_text(
+        person["first_name"], person["last_name"], person["desired_email"], person["password"]
+    )
+    message = create_message(
+        google_clients.settings["sender_address"],
+        person["secondary_email"],
+        "Access Details for Google Workspace Account",
+        message_text,
+        reply_to=google_clients.settings["admin_account"],
+    )
+    person["outbox_id"] = mail_outbox.enqueue(
+        message,
+        f"credentials for {person['desired_email']} to {person['secondary_email']}",
+        chat_id=job["chat_id"],
+        tenant=tenants.current().name,
+    )
+    # The outbox keeps the message until it is sent, the password is not needed any more
+    del person["password"]
+    provisioning.save_payload(job)
+
+
+def in_job_tenant(step):
+    """Run a provisioning step on the tenant the job was submitted for."""
+
+    @wraps(step)
+    async def wrapper(job):
+        with tenants.activate(job["tenant"]):
+            return await step(job)
+
+    return wrapper
+
+
+provisioning = ProvisioningQueue(
+    os.getenv("PROVISIONING_DB", "data/provisioning.sqlite3"),
+    steps={
+        "sheet_row": in_job_tenant(provision_sheet_row),
+        "workspace_user": in_job_tenant(provision_workspace_user),
+        "credentials_email": in_job_tenant(provision_credentials_email),
+    },
+    workers=int(os.getenv("PROVISIONING_WORKERS", "4")),
+)
+
+
+@log_to_sheet
+async def bulk_add(update: Update, context: CallbackContext) -> None:
+    """Create many users at once from an uploaded CSV file or a sheet range."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    usage = (
+        "Usage: send a CSV file with the caption /bulkadd, or /bulkadd <Sheet!A2:E>\n"
+        "Columns: First Name, Last Name, Desired Email, Secondary Email, Comment"
+    )
+
+    # Read all rows from the uploaded file or the named range
+    try:
+        document = update.message.document
+        if document:
+            file = await context.bot.get_file(document.file_id)
+            rows = read_csv(bytes(await file.download_as_bytearray()))
+        elif context.args:
+            result = await google_api.run(
+                "sheets",
+                lambda: google_clients.accounts_sheet.spreadsheet.values_get(
+                    " ".join(context.args)
+                ),
+            )
+            rows = result.get("values", [])
+        else:
+            await update.message.reply_text(usage)
+            return
+    except (gspread.exceptions.APIError, UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Error reading bulk add rows: {e}")
+        await update.message.reply_text(f"Could not read the rows: {e}\n{usage}")
+        return
+
+    # Validate everything before creating anything
+    people, errors = validate_rows(
+        rows,
+        existing_email=lambda email: (
+            directory_cache.addresses.owner(email)
+            or accounts_mirror.find(email)
+            or provisioning.find(email) is not None
+        ),
+        suggest=lambda person: free_addresses(
+            person["first_name"], person["last_name"], person["desired_email"]
+        ),
+    )
+    if errors:
+        report = "\n".join(f"Row {number}: {error}" for number, error in errors)
         await update.message.reply_text(
-            f"The account for {first_name} {last_name} has been created."
+            f"Nothing was created, please fix these rows:\n{report}"[:4000]
         )
-    except Exception as e:
-        logger.error(f"Error: {e}")
+        return
+    if not people:
+        await update.message.reply_text(f"No rows found.\n{usage}")
+        return
+
+    # One append_rows call for all rows, then the provisioning queue creates the accounts
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    requested_by = update.message.from_user.username
+    for person in people:
+        person["timestamp"] = timestamp
+        person["requested_by"] = requested_by
+    try:
+        submitted = await submit_with_rows(
+            people, update.effective_chat.id, requested_by, tenants.current().name
+        )
+    except gspread.exceptions.APIError as e:
+        logger.error(f"Error adding bulk rows to Google Sheet: {e}")
         await update.message.reply_text(
-            f"There is an error sending email. Please verify your input. {e}"
+            "Nothing was created: the rows could not be added to Google Sheet. "
+            "Send the same request again to retry."
+        )
+        return
+
+    results = [(person, job) for person, (job, _) in zip(people, submitted)]
+    summary = (
+        f"Queued {len(results)} accounts. "
+        "I will report here when each account is ready."
+    )
+    lines = [f"✅ Row {p['row']}: {p['desired_email']}: job {job['id']}" for p, job in results]
+    report = summary + "\n\n" + "\n".join(lines)
+    if len(report) <= 4000:
+        await update.message.reply_text(report)
+    else:
+        # Too long for one message, attach the per-row report as a file
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["Row", "Email", "Job"])
+        for p, job in results:
+            writer.writerow([p["row"], p["desired_email"], job["id"]])
+        await update.message.reply_document(
+            io.BytesIO(output.getvalue().encode()),
+            filename="bulkadd_report.csv",
+            caption=summary,
         )
 
 
@@ -433,19 +823,30 @@ async def suspend_user(update: Update, context: CallbackContext) -> None:
 
     try:
         email = context.args[0]
+        if len(context.args) > 1:
+            await suspend_many(update, context.args)
+            return
+
         if email in BOT_PROTECTED_ACCOUNTS:
             await update.message.reply_text(
                 f"The account with email {email} cannot be suspended."
             )
             return
 
-        service.users().update(userKey=email, body={"suspended": True}).execute()
+        user = await google_api.run(
+            "directory",
+            lambda: google_clients.directory.users()
+            .update(userKey=email, body={"suspended": True})
+            .execute(),
+        )
+        directory_cache.put(user)
+        directory_reads.forget()
         await update.message.reply_text(
             f"The account with email {email} has been suspended."
         )
     except IndexError:
         await update.message.reply_text(
-            "Please provide an email address. Usage: /suspend <email>"
+            "Please provide an email address. Usage: /suspend <email> [<email> ...]"
         )
     except HttpError as e:
         logger.error(f"There is an error suspending user in Google Workspace: {e}")
@@ -454,6 +855,28 @@ async def suspend_user(update: Update, context: CallbackContext) -> None:
         )
 
 
+async def suspend_many(update: Update, emails) -> None:
+    """Suspend several users with paced, batched Directory API calls."""
+    lines = []
+    targets = []
+    for email in dict.fromkeys(emails):
+        if email in BOT_PROTECTED_ACCOUNTS:
+            lines.append(f"⛔ {email}: cannot be suspended")
+        else:
+            targets.append(email)
+
+    results = await suspend_in_batches(targets)
+
+    for email in targets:
+        user, error = results[email]
+        if error:
+            lines.append(f"❌ {email}: {error_reason(error)}")
+        else:
+            lines.append(f"✅ {email}: suspended")
+
+    await reply_in_chunks(update.message, "\n".join(lines))
+
+
 @log_to_sheet
 async def get_user_info(update: Update, context: CallbackContext) -> None:
     """Retrieve user information by their email address."""
@@ -468,7 +891,10 @@ async def get_user_info(update: Update, context: CallbackContext) -> None:
                 f"The account info for email {email} cannot be disclosed."
             )
             return
-        user = service.users().get(userKey=email).execute()
+        user = directory_cache.get(email)
+        if user is None:
+            user = await directory_reads.run(("user", email.lower()), fetch_user, email)
+            directory_cache.put(user)
 
         first_name = user["name"]["givenName"]
         last_name = user["name"]["familyName"]
@@ -487,6 +913,97 @@ async def get_user_info(update: Update, context: CallbackContext) -> None:
         )
 
 
+def format_request(record):
+    """One line describing an accounts sheet row."""
+    line = (
+        f"{record['desired_email']} ({record['name']}) requested by "
+        f"{record['requested_by'] or 'unknown'} on {record['timestamp'] or 'unknown date'}"
+    )
+    if record["secondary_email"]:
+        line += f", secondary {record['secondary_email']}"
+    if record["comment"]:
+        line += f", {record['comment']}"
+    return line
+
+
+@log_to_sheet
+async def who_requested(update: Update, context: CallbackContext) -> None:
+    """Show who requested an account, from the local copy of the accounts sheet."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    if not context.args:
+        await update.message.reply_text("Usage: /whorequested <email>")
+        return
+    records = accounts_mirror.lookup(context.args[0])
+    if not records:
+        await update.message.reply_text(f"No request found for {context.args[0]}.")
+        return
+    await reply_in_chunks(update.message, "\n".join(format_request(r) for r in records))
+
+
+@log_to_sheet
+async def list_requests(update: Update, context: CallbackContext) -> None:
+    """List account requests since a date, from the local copy of the accounts sheet."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    usage = "Usage: /requests [--since <YYYY-MM-DD | 7d>] [--by <username>]"
+    args = list(context.args or [])
+    since = datetime.date.today() - datetime.timedelta(days=7)
+    requested_by = None
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg == "--since":
+                value = args.pop(0)
+                if value.endswith("d") and value[:-1].isdigit():
+                    since = datetime.date.today() - datetime.timedelta(days=int(value[:-1]))
+                else:
+                    since = datetime.date.fromisoformat(value)
+            elif arg == "--by":
+                requested_by = args.pop(0).lstrip("@")
+            else:
+                raise ValueError(arg)
+    except (IndexError, ValueError):
+        await update.message.reply_text(usage)
+        return
+
+    records = accounts_mirror.since(since.isoformat(), requested_by)
+    if not records:
+        await update.message.reply_text(f"No requests since {since.isoformat()}.")
+        return
+    lines = [f"{len(records)} requests since {since.isoformat()}:"]
+    lines.extend(format_request(r) for r in records)
+    await reply_in_chunks(update.message, "\n".join(lines))
+
+
+@log_to_sheet
+async def audit(update: Update, context: CallbackContext) -> None:
+    """Search the audit log by user, command, target email and time range."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    try:
+        filters = parse_audit_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(AUDIT_USAGE)
+        return
+
+    # Answered from the local store, Google Sheets is not read
+    entries = audit_log.store.query(**filters)
+    if not entries:
+        await update.message.reply_text("No matching audit log entries.")
+        return
+    show_tenant = len(tenants.names()) > 1
+    lines = [f"{len(entries)} most recent matching entries:"]
+    lines.extend(format_entry(entry, show_tenant) for entry in entries)
+    await reply_in_chunks(update.message, "\n".join(lines))
+
+
 @log_to_sheet
 async def help_command(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /help is issued."""
@@ -497,114 +1014,551 @@ async def help_command(update: Update, context: CallbackContext) -> None:
     help_text = (
         "Available commands:\n"
         "/start - Send a welcome message and instructions\n"
-        "/suspend <email> - Suspend a user by their email address\n"
+        "/suspend <email> [<email> ...] - Suspend users by their email addresses\n"
         "/userinfo <email> - Retrieve user information by their email address\n"
         "/adduser <First Name> <Last Name> <Desired Email> <Secondary Email> <Comment> - Add a new user to Google Workspace\n"
-        "/listusers - Lists all users in Google Workspace\n"
-        "/resetpw <email> - Reset user's password and force change on next login\n"
+        "/bulkadd <Sheet!A2:E> - Add many users from a sheet range or an uploaded CSV file with this caption\n"
+        "/listusers [--live] [--suspended] [--inactive 90d] [--ou <path>] - Lists users in Google Workspace page by page (--live bypasses the cache)\n"
+        "/listusers --export csv|xlsx [--gzip] [--columns email,ou,2sv,...] [filters] - Send the list as a file\n"
+        "/resetpw [--email] <email> [<email> ...] | --ou <OU path> - Reset passwords and force change on next login\n"
+        "/sweep - Report inactive accounts and suspend them after confirmation\n"
+        "/reconcile - Compare the accounts sheet with Google Workspace and fix differences after confirmation\n"
+        "/whorequested <email> - Show who requested an account\n"
+        "/requests [--since <YYYY-MM-DD | 7d>] [--by <username>] - List account requests\n"
+        "/audit [--user <username>] [--command <name>] [--email <email>] [--since <YYYY-MM-DD | 7d>] [--until <YYYY-MM-DD>] - Search the audit log\n"
+        "/tenant [<name>] - Show or switch the Google Workspace tenant of this chat\n"
         "/health - Check bot and API health status\n"
+        "/stats - Show handler and API latency, errors and queue depths\n"
         "/help - Show this help message"
     )
     await update.message.reply_text(help_text)
 
 
+async def stream_users(live, filters, position):
+    """Yield (user, position) pairs matching the filters, starting at position.
+
+    Users come from the directory cache, or page by page from the Directory
+    API when ``live`` is set, so only one page is held in memory. A position
+    can be passed back in to resume the stream at that user.
+    """
+    matches = build_matcher(filters)
+    if not live:
+        users = directory_cache.users()
+        for index in range(position or 0, len(users)):
+            if matches(users[index]):
+                yield users[index], index
+        return
+
+    page_token, offset = position or (None, 0)
+    while True:
+        query = build_query(filters)
+        results = await directory_reads.run(
+            ("users_page", page_token, query),
+            fetch_users_page,
+            page_token,
+            query,
+            LIST_API_PAGE_SIZE,
+        )
+        users = results.get("users", [])
+        for index in range(offset, len(users)):
+            if matches(users[index]):
+                yield users[index], (page_token, index)
+        page_token = results.get("nextPageToken")
+        offset = 0
+        if not page_token:
+            return
+
+
+async def render_users_page(cursor_id, page):
+    """Render a page of a /listusers cursor and its navigation keyboard."""
+    cursor = list_cursors[cursor_id]
+    users = []
+    next_position = None
+    async for user, position in stream_users(
+        cursor["live"], cursor["filters"], cursor["positions"][page]
+    ):
+        # Skip protected accounts
+        if user["primaryEmail"] in BOT_PROTECTED_ACCOUNTS:
+            continue
+        if len(users) == PAGE_SIZE:
+            next_position = position
+            break
+        users.append(user)
+
+    if next_position is not None:
+        del cursor["positions"][page + 1 :]
+        cursor["positions"].append(next_position)
+
+    buttons = []
+    if page > 0:
+        buttons.append(
+            InlineKeyboardButton("◀ Prev", callback_data=f"lu:{cursor_id}:{page - 1}")
+        )
+    if next_position is not None:
+        buttons.append(
+            InlineKeyboardButton("Next ▶", callback_data=f"lu:{cursor_id}:{page + 1}")
+        )
+    keyboard = InlineKeyboardMarkup([buttons]) if buttons else None
+
+    if not users:
+        return "No users found.", keyboard
+    return render_page(users, page + 1), keyboard
+
+
 @log_to_sheet
 async def list_users(update: Update, context: CallbackContext) -> None:
-    """List all users with their status and last login date."""
+    """List users with their status and last login date, one page at a time."""
     if not is_authorized(update.message.from_user.username):
         await update.message.reply_text("You are not authorised to use this command.")
         return
 
     try:
-        # Get list of all users with pagination
-        users = []
-        page_token = None
-        while True:
-            results = (
-                service.users()
-                .list(
-                    customer="my_customer",
-                    orderBy="email",
-                    projection="full",
-                    pageToken=page_token,
-                    maxResults=500,  # Maximum allowed by the API
-                )
-                .execute()
+        filters = parse_list_args(context.args)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"{e}\nUsage: /listusers [--live] [--suspended] [--inactive 90d] [--ou <path>] "
+            "[--export csv|xlsx [--gzip] [--columns email,ou,2sv,...]]"
+        )
+        return
+
+    if filters["export"]:
+        await export_users(update, filters)
+        return
+
+    # Serve from the directory cache unless a live listing is requested
+    cursor_id = uuid.uuid4().hex[:12]
+    list_cursors[cursor_id] = {
+        "tenant": tenants.current().name,
+        "live": filters["live"] or not directory_cache.ready,
+        "filters": filters,
+        "positions": [None],
+    }
+    while len(list_cursors) > MAX_LIST_CURSORS:
+        list_cursors.popitem(last=False)
+
+    try:
+        text, keyboard = await render_users_page(cursor_id, 0)
+        await send_users_page(update.message.reply_text, text, keyboard)
+    except HttpError as e:
+        logger.error(f"Error retrieving users from Google Workspace: {e}")
+        await update.message.reply_text(
+            "Error retrieving users from Google Workspace. Please try again later."
+        )
+
+
+async def export_users(update: Update, filters) -> None:
+    """Send the users matching the filters as one CSV or XLSX document."""
+    try:
+        columns = parse_columns(filters["columns"] or os.getenv(
+            "EXPORT_COLUMNS", "email,name,status,ou,created,last_login,aliases,2sv"
+        ))
+        export = UserExport(filters["export"], columns, compress=filters["gzip"])
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
+
+    try:
+        # Users are written as they arrive, one Directory API page at a time
+        async for user, _ in stream_users(
+            filters["live"] or not directory_cache.ready, filters, None
+        ):
+            if user["primaryEmail"] not in BOT_PROTECTED_ACCOUNTS:
+                export.write(user)
+        path = await asyncio.get_running_loop().run_in_executor(None, export.close)
+        with open(path, "rb") as f:
+            await update.message.reply_document(
+                f,
+                filename=f"users-{datetime.date.today().isoformat()}{export.extension}",
+                caption=f"{export.rows} users",
             )
+    except HttpError as e:
+        logger.error(f"Error retrieving users from Google Workspace: {e}")
+        await update.message.reply_text(
+            "Error retrieving users from Google Workspace. Please try again later."
+        )
+    finally:
+        export.discard()
 
-            users.extend(results.get("users", []))
-            page_token = results.get("nextPageToken")
-            if not page_token:
-                break
-
-        # Prepare data for table
-        table_data = []
-        for user in users:
-            email = user["primaryEmail"]
-            # Skip protected accounts if needed
-            if email in BOT_PROTECTED_ACCOUNTS:
-                continue
 
-            is_suspended = user.get("suspended", False)
-            status = "🔴 Suspended" if is_suspended else "🟢 Active"
+async def list_users_page(update: Update, context: CallbackContext) -> None:
+    """Show another page of a /listusers result from the inline buttons."""
+    query = update.callback_query
+    if not is_authorized(query.from_user.username):
+        await query.answer("You are not authorised to use this command.")
+        return
 
-            # Get last login time
-            last_login = user.get("lastLoginTime", None)
-            if last_login:
-                # Convert to datetime and format
-                last_login_dt = datetime.datetime.strptime(
-                    last_login, "%Y-%m-%dT%H:%M:%S.%fZ"
-                )
-                last_login_str = last_login_dt.strftime("%Y-%m-%d %H:%M")
-            else:
-                last_login_str = "Never"
+    _, cursor_id, page = query.data.split(":")
+    if cursor_id not in list_cursors:
+        await query.answer("This listing has expired, please run /listusers again.")
+        return
 
-            # Get creation time
-            creation_time = user.get("creationTime", None)
-            if creation_time:
-                creation_dt = datetime.datetime.strptime(
-                    creation_time, "%Y-%m-%dT%H:%M:%S.%fZ"
-                )
-                creation_str = creation_dt.strftime("%Y-%m-%d %H:%M")
-            else:
-                creation_str = "Unknown"
+    await query.answer()
+    try:
+        # Page through the tenant that was listed, even after /tenant switched the chat
+        with tenants.activate(list_cursors[cursor_id]["tenant"]):
+            text, keyboard = await render_users_page(cursor_id, int(page))
+        await send_users_page(query.edit_message_text, text, keyboard)
+    except HttpError as e:
+        logger.error(f"Error retrieving users from Google Workspace: {e}")
+        await query.edit_message_text(
+            "Error retrieving users from Google Workspace. Please try again later."
+        )
 
-            table_data.append([email, status, creation_str, last_login_str])
 
-        if not table_data:
-            await update.message.reply_text("No users found.")
-            return
+async def send_users_page(send, text, keyboard):
+    """Send or edit a page, falling back to plain text if Markdown fails."""
+    try:
+        await send(f"```\n{text}\n```", parse_mode="MarkdownV2", reply_markup=keyboard)
+    except TelegramError:
+        # If markdown parsing fails, try sending without special formatting
+        await send(text, reply_markup=keyboard)
 
-        # Split table_data into chunks of 50 rows
-        chunk_size = 50
-        for i in range(0, len(table_data), chunk_size):
-            chunk = table_data[i : i + chunk_size]
-
-            # Create table for this chunk
-            table = tabulate(
-                chunk,
-                headers=["Email", "Status", "Created On", "Last Login"],
-                tablefmt="simple",
-                numalign="left",
-            )
 
-            # Add page number info
-            page_number = f"\nPage {i//chunk_size + 1} of {(len(table_data) + chunk_size - 1)//chunk_size}"
+SWEEP_NEVER_LOGGED_IN_DAYS = int(os.getenv("SWEEP_NEVER_LOGGED_IN_DAYS", "14"))
+SWEEP_IDLE_DAYS = int(os.getenv("SWEEP_IDLE_DAYS", "90"))
+MAX_PENDING_SWEEPS = 20
+# Sweep ID -> {cohort: [email, ...]} waiting for confirmation
+pending_sweeps = collections.OrderedDict()
+
+
+async def prepare_sweep():
+    """Compute the inactivity cohorts and return the dry-run report and buttons.
+
+    The keyboard is None when there is nothing to suspend.
+    """
+    if directory_cache.ready:
+        users = directory_cache.users()
+    else:
+        users = [user async for user, _ in stream_users(True, parse_list_args([]), None)]
+    cohorts = classify_users(
+        users, SWEEP_NEVER_LOGGED_IN_DAYS, SWEEP_IDLE_DAYS, skip=BOT_PROTECTED_ACCOUNTS
+    )
+    text = render_report(cohorts, SWEEP_NEVER_LOGGED_IN_DAYS, SWEEP_IDLE_DAYS)
+    total = sum(len(users) for users in cohorts.values())
+    if not total:
+        return text, None
+
+    sweep_id = uuid.uuid4().hex[:12]
+    pending_sweeps[sweep_id] = (
+        tenants.current().name,
+        {key: [user["primaryEmail"] for user in users] for key, users in cohorts.items()},
+    )
+    while len(pending_sweeps) > MAX_PENDING_SWEEPS:
+        pending_sweeps.popitem(last=False)
+
+    buttons = [
+        [InlineKeyboardButton(f"Suspend {name} ({len(cohorts[key])})", callback_data=f"sw:{sweep_id}:{key}")]
+        for key, name in COHORTS
+        if cohorts[key]
+    ]
+    buttons.append(
+        [
+            InlineKeyboardButton(f"Suspend all ({total})", callback_data=f"sw:{sweep_id}:all"),
+            InlineKeyboardButton("Cancel", callback_data=f"sw:{sweep_id}:cancel"),
+        ]
+    )
+    return text, InlineKeyboardMarkup(buttons)
+
+
+async def update_in_batches(updates, on_progress=None):
+    """Apply ``{email: body}`` user updates in paced Directory API batches.
+
+    Protected accounts are left out. Items throttled inside a batch (the
+    envelope succeeds, the item gets a 429 or a rate limit reason) are sent
+    again in later rounds, up to ``DIRECTORY_THROTTLE_RETRIES`` times with a
+    doubling pause. Returns ``{email: (user, error)}``.
+    """
+    batch_size = int(os.getenv("DIRECTORY_WRITE_BATCH_SIZE", "100"))
+    pacer = Pacer(float(os.getenv("DIRECTORY_WRITE_RATE", "10")) / batch_size)
+    retries = int(os.getenv("DIRECTORY_THROTTLE_RETRIES", "3"))
+    emails = [email for email in updates if email not in BOT_PROTECTED_ACCOUNTS]
+    results = {}
+
+    def update_chunk(chunk):
+        directory = google_clients.directory
+        requests = [
+            (email, directory.users().update(userKey=email, body=updates[email])) for email in chunk
+        ]
+        return execute_batch(directory, requests, DIRECTORY_BATCH_LIMIT)
+
+    pending = emails
+    for attempt in range(retries + 1):
+        throttled = []
+        retry_after = 0.0
+        for start in range(0, len(pending), batch_size):
+            await pacer.wait()
+            batch = await google_api.run("directory", update_chunk, pending[start : start + batch_size])
+            directory_reads.forget()
+            for email, (user, error) in batch.items():
+                if error is None:
+                    directory_cache.put(user)
+                    continue
+                kind, delay = classify_error(error)
+                if kind == "throttled":
+                    throttled.append(email)
+                    retry_after = max(retry_after, delay or 0.0)
+            results.update(batch)
+            if on_progress:
+                await on_progress(len(results) - len(throttled), len(emails))
+        pending = throttled
+        if not pending or attempt == retries:
+            break
+        delay = max(retry_after, float(2 ** attempt))
+        logger.warning(f"{len(pending)} Directory updates throttled, retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+    return results
+
+
+async def suspend_in_batches(emails, on_progress=None):
+    """Suspend users in paced Directory API batches; return ``{email: (user, error)}``."""
+    return await update_in_batches({email: {"suspended": True} for email in emails}, on_progress)
 
-            # Send message with this chunk
-            try:
-                await update.message.reply_text(
-                    f"```\n{table}{page_number}\n```", parse_mode="MarkdownV2"
-                )
-            except Exception as e:
-                # If markdown parsing fails, try sending without special formatting
-                await update.message.reply_text(f"{table}{page_number}")
 
+@log_to_sheet
+async def sweep(update: Update, context: CallbackContext) -> None:
+    """Report inactive accounts and offer to suspend them."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    try:
+        text, keyboard = await prepare_sweep()
     except HttpError as e:
         logger.error(f"Error retrieving users from Google Workspace: {e}")
         await update.message.reply_text(
             "Error retrieving users from Google Workspace. Please try again later."
         )
+        return
+    await update.message.reply_text(text[:4000], reply_markup=keyboard)
+
+
+async def sweep_confirm(update: Update, context: CallbackContext) -> None:
+    """Suspend the cohort chosen with the buttons of a sweep report."""
+    query = update.callback_query
+    if not is_authorized(query.from_user.username):
+        await query.answer("You are not authorised to use this command.")
+        return
+
+    _, sweep_id, choice = query.data.split(":")
+    if sweep_id not in pending_sweeps:
+        await query.answer("This sweep has expired, please run /sweep again.")
+        return
+    tenant, cohorts = pending_sweeps[sweep_id]
+    if tenant != tenants.current().name:
+        await query.answer(f"This sweep is for tenant {tenant}, switch back with /tenant {tenant}.")
+        return
+    # Popped so that a second tap cannot run the same sweep twice
+    del pending_sweeps[sweep_id]
+    await query.answer()
+    if choice == "cancel":
+        log_callback(update, "sweep_confirm", f"sweep {sweep_id}: cancel")
+        await query.edit_message_text("Sweep cancelled, no accounts were suspended.")
+        return
+
+    emails = [email for key, _ in COHORTS if choice in (key, "all") for email in cohorts[key]]
+    if directory_cache.ready:
+        # Leave out users who logged in or were suspended since the report
+        still_inactive = classify_users(
+            [directory_cache.get(email) or {"primaryEmail": email} for email in emails],
+            SWEEP_NEVER_LOGGED_IN_DAYS,
+            SWEEP_IDLE_DAYS,
+            skip=BOT_PROTECTED_ACCOUNTS,
+        )
+        current = {user["primaryEmail"] for users in still_inactive.values() for user in users}
+        emails = [email for email in emails if email in current]
+
+    log_callback(
+        update, "sweep_confirm", f"sweep {sweep_id}: suspend {choice} ({len(emails)} accounts)"
+    )
+    await query.edit_message_text(f"Suspending accounts: 0/{len(emails)}")
+    last_edit = time.monotonic()
+
+    async def on_progress(done, total):
+        nonlocal last_edit
+        # Telegram limits how often a message can be edited
+        if done < total and time.monotonic() - last_edit < 3:
+            return
+        last_edit = time.monotonic()
+        try:
+            await query.edit_message_text(f"Suspending accounts: {done}/{total}")
+        except TelegramError:
+            pass
+
+    results = await suspend_in_batches(emails, on_progress)
+    failed = [(email, error) for email, (_, error) in results.items() if error is not None]
+    lines = [f"Suspended {len(results) - len(failed)} of {len(results)} inactive accounts."]
+    lines.extend(f"❌ {email}: {error_reason(error)}" for email, error in failed)
+    await query.edit_message_text("\n".join(lines)[:4000])
+
+
+async def inactive_sweep_job(context: CallbackContext) -> None:
+    """Periodically send the sweep report to SWEEP_CHAT_ID for confirmation."""
+    chat_id = int(os.getenv("SWEEP_CHAT_ID"))
+    try:
+        # For the tenant selected in that chat
+        with tenants.activate(tenants.for_chat(chat_id).name):
+            text, keyboard = await prepare_sweep()
+    except Exception as e:
+        logger.error(f"Error preparing inactive account sweep: {e}")
+        return
+    if keyboard is not None:
+        await context.bot.send_message(chat_id, text[:4000], reply_markup=keyboard)
+
+
+def mark_suspended_rows(rows):
+    """Write the suspended status into accounts sheet rows (blocking, run through google_api)."""
+    google_clients.accounts_sheet.batch_update(
+        [{"range": f"{STATUS_COLUMN}{row}", "values": [[SUSPENDED]]} for row in rows]
+    )
+
+
+MAX_PENDING_RECONCILES = 20
+# Reconciliation ID -> planned changes waiting for confirmation
+pending_reconciles = collections.OrderedDict()
+
+
+async def prepare_reconcile():
+    """Diff the accounts sheet against the directory and return the dry-run report and buttons.
+
+    Reads the sheet with one ranged call and brings the directory cache up to
+    date with its etag diff. The keyboard is None when there is nothing to do.
+    """
+    rows = await fetch_account_rows(1)
+    await directory_cache.refresh()
+    changes, problems = plan_changes(
+        rows,
+        directory_cache.users(),
+        skip=BOT_PROTECTED_ACCOUNTS,
+        busy=provisioning.active_emails(),
+    )
+    text = render_plan(changes, problems)
+    if not any(changes.values()):
+        return text, None
+
+    reconcile_id = uuid.uuid4().hex[:12]
+    pending_reconciles[reconcile_id] = (tenants.current().name, changes)
+    while len(pending_reconciles) > MAX_PENDING_RECONCILES:
+        pending_reconciles.popitem(last=False)
+
+    buttons = [
+        [InlineKeyboardButton(f"Apply: {description} ({len(changes[key])})", callback_data=f"rc:{reconcile_id}:{key}")]
+        for key, description in CHANGES
+        if changes[key]
+    ]
+    buttons.append(
+        [
+            InlineKeyboardButton("Apply all", callback_data=f"rc:{reconcile_id}:all"),
+            InlineKeyboardButton("Cancel", callback_data=f"rc:{reconcile_id}:cancel"),
+        ]
+    )
+    return text, InlineKeyboardMarkup(buttons)
+
+
+@log_to_sheet
+async def reconcile(update: Update, context: CallbackContext) -> None:
+    """Show how the directory differs from the accounts sheet and offer to fix it."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    try:
+        text, keyboard = await prepare_reconcile()
+    except (HttpError, gspread.exceptions.APIError) as e:
+        logger.error(f"Error preparing reconciliation: {e}")
+        await update.message.reply_text(
+            "Error reading Google Sheet or Google Workspace. Please try again later."
+        )
+        return
+    await update.message.reply_text(text[:4000], reply_markup=keyboard)
+
+
+async def reconcile_confirm(update: Update, context: CallbackContext) -> None:
+    """Apply the changes chosen with the buttons of a reconciliation report."""
+    query = update.callback_query
+    if not is_authorized(query.from_user.username):
+        await query.answer("You are not authorised to use this command.")
+        return
+
+    _, reconcile_id, choice = query.data.split(":")
+    if reconcile_id not in pending_reconciles:
+        await query.answer("This reconciliation has expired, please run /reconcile again.")
+        return
+    tenant, changes = pending_reconciles[reconcile_id]
+    if tenant != tenants.current().name:
+        await query.answer(
+            f"This reconciliation is for tenant {tenant}, switch back with /tenant {tenant}."
+        )
+        return
+    # Popped so that a second tap cannot apply the same changes twice
+    del pending_reconciles[reconcile_id]
+    await query.answer()
+    if choice == "cancel":
+        log_callback(update, "reconcile_confirm", f"reconcile {reconcile_id}: cancel")
+        await query.edit_message_text("Reconciliation cancelled, nothing was changed.")
+        return
+    changes = {key: items if choice in (key, "all") else [] for key, items in changes.items()}
+    counts = ", ".join(f"{len(items)} {key}" for key, items in changes.items() if items)
+    log_callback(
+        update, "reconcile_confirm", f"reconcile {reconcile_id}: apply {choice} ({counts})"
+    )
+
+    lines = []
+    if changes["create"]:
+        submitted = provisioning.submit_many(
+            changes["create"],
+            query.message.chat.id,
+            query.from_user.username,
+            start_step="workspace_user",
+            tenant=tenants.current().name,
+        )
+        lines.append(f"Queued {sum(is_new for _, is_new in submitted)} accounts for creation.")
+
+    # One Directory call per changed user, even with several changes
+    updates = {email: dict(body) for email, body in changes["update"]}
+    for email in changes["suspend"]:
+        updates.setdefault(email, {})["suspended"] = True
+    if updates:
+        await query.edit_message_text(f"Updating accounts: 0/{len(updates)}")
+        last_edit = time.monotonic()
+
+        async def on_progress(done, total):
+            nonlocal last_edit
+            if done < total and time.monotonic() - last_edit < 3:
+                return
+            last_edit = time.monotonic()
+            try:
+                await query.edit_message_text(f"Updating accounts: {done}/{total}")
+            except TelegramError:
+                pass
+
+        results = await update_in_batches(updates, on_progress)
+        failed = [(email, error) for email, (_, error) in results.items() if error is not None]
+        lines.append(f"Updated {len(results) - len(failed)} of {len(results)} accounts.")
+        lines.extend(f"❌ {email}: {error_reason(error)}" for email, error in failed)
+
+    if changes["mark"]:
+        try:
+            await google_api.run("sheets", mark_suspended_rows, [row for row, _ in changes["mark"]])
+            lines.append(f"Marked {len(changes['mark'])} suspended accounts in Google Sheet.")
+        except gspread.exceptions.APIError as e:
+            logger.error(f"Error marking suspended accounts in Google Sheet: {e}")
+            lines.append("❌ Could not mark suspended accounts in Google Sheet.")
+
+    await query.edit_message_text("\n".join(lines)[:4000])
+
+
+async def reconcile_job(context: CallbackContext) -> None:
+    """Periodically send the reconciliation dry run to RECONCILE_CHAT_ID."""
+    chat_id = int(os.getenv("RECONCILE_CHAT_ID"))
+    try:
+        # For the tenant selected in that chat
+        with tenants.activate(tenants.for_chat(chat_id).name):
+            text, keyboard = await prepare_reconcile()
+    except Exception as e:
+        logger.error(f"Error preparing reconciliation: {e}")
+        return
+    if keyboard is not None:
+        await context.bot.send_message(chat_id, text[:4000], reply_markup=keyboard)
 
 
 @log_to_sheet
@@ -619,10 +1573,16 @@ async def reset_password(update: Update, context: CallbackContext) -> None:
         # Check if email was provided
         if not context.args:
             await update.message.reply_text(
-                "Please provide an email address. Usage: /resetpw <email>"
+                "Please provide an email address. Usage: /resetpw <email>\n"
+                "or /resetpw [--email] <email> [<email> ...]\n"
+                "or /resetpw [--email] --ou <OU path>"
             )
             return
 
+        if len(context.args) > 1:
+            await reset_password_many(update, context.args)
+            return
+
         email = context.args[0]
 
         # Check if it's a protected account
@@ -639,22 +1599,27 @@ async def reset_password(update: Update, context: CallbackContext) -> None:
         user_update = {"password": new_password, "changePasswordAtNextLogin": True}
 
         try:
-            service.users().update(userKey=email, body=user_update).execute()
+            # The updated user resource is returned, so no extra get is needed
+            user = await google_api.run(
+                "directory",
+                lambda: google_clients.directory.users()
+                .update(userKey=email, body=user_update)
+                .execute(),
+            )
+            directory_cache.put(user)
 
-            # Get user info for the response
-            user = service.users().get(userKey=email).execute()
             first_name = user["name"]["givenName"]
             last_name = user["name"]["familyName"]
 
-            # Format response message
-            response = (
-                f"Password has been reset for {first_name} {last_name} ({email})\n\n"
-                f"New temporary password: `{new_password}`\n\n"
-                "User will be required to change password on next login."
-            )
-
             # Send response with password in monospace format
-            await update.message.reply_text(response, parse_mode="Markdown")
+            await reply_with_passwords(
+                update.message,
+                [
+                    f"Password has been reset for {html.escape(f'{first_name} {last_name} ({email})')}\n",
+                    f"New temporary password: <code>{html.escape(new_password)}</code>\n",
+                    "User will be required to change password on next login.",
+                ],
+            )
 
         except HttpError as e:
             error_message = e._get_reason() if hasattr(e, "_get_reason") else str(e)
@@ -670,6 +1635,108 @@ async def reset_password(update: Update, context: CallbackContext) -> None:
         )
 
 
+async def reset_password_many(update: Update, args) -> None:
+    """Reset passwords for a list of users or a whole OU using batched calls.
+
+    With --email the new credentials are sent to each user's recovery email
+    instead of being shown in the chat.
+    """
+    args = list(args)
+    email_credentials = "--email" in args
+    if email_credentials:
+        args.remove("--email")
+
+    try:
+        if "--ou" in args:
+            org_unit_path = args[args.index("--ou") + 1]
+            emails = await fetch_ou_emails(org_unit_path)
+        else:
+            emails = args
+    except IndexError:
+        await update.message.reply_text("Usage: /resetpw [--email] --ou <OU path>")
+        return
+
+    lines = []
+    passwords = {}
+    for email in dict.fromkeys(emails):
+        if email in BOT_PROTECTED_ACCOUNTS:
+            lines.append(f"⛔ {html.escape(email)}: cannot be reset using this bot")
+        else:
+            passwords[email] = generate_random_password()
+    if not passwords:
+        lines.append("No users to reset.")
+
+    results = await update_in_batches(
+        {
+            email: {"password": password, "changePasswordAtNextLogin": True}
+            for email, password in passwords.items()
+        }
+    )
+
+    for email, password in passwords.items():
+        user, error = results[email]
+        if error:
+            lines.append(f"❌ {html.escape(email)}: {html.escape(error_reason(error))}")
+            continue
+        if email_credentials and user.get("recoveryEmail"):
+            message = create_message(
+                google_clients.settings["sender_address"],
+                user["recoveryEmail"],
+                "Password Reset for Google Workspace Account",
+                generate_email_text(
+                    user["name"]["givenName"],
+                    user["name"]["familyName"],
+                    email,
+                    password,
+                ),
+                reply_to=google_clients.settings["admin_account"],
+            )
+            mail_outbox.enqueue(
+                message,
+                f"new password for {email} to {user['recoveryEmail']}",
+                chat_id=update.effective_chat.id,
+                notify="failures",
+                tenant=tenants.current().name,
+            )
+            lines.append(
+                f"✅ {html.escape(email)}: new password will be emailed to "
+                f"{html.escape(user['recoveryEmail'])}"
+            )
+        else:
+            lines.append(f"✅ {html.escape(email)}: new password <code>{html.escape(password)}</code>")
+
+    lines.append("\nUsers will be required to change password on next login.")
+    await reply_with_passwords(update.message, lines)
+
+
+@log_to_sheet
+async def switch_tenant(update: Update, context: CallbackContext) -> None:
+    """Show or switch the Google Workspace tenant managed in this chat."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
+
+    if not context.args:
+        current = tenants.current()
+        others = [name for name in tenants.names() if name != current.name]
+        text = f"This chat manages {current.name} ({current.settings['admin_account']})."
+        if others:
+            text += f"\nOther tenants: {', '.join(others)}. Switch with /tenant <name>."
+        await update.message.reply_text(text)
+        return
+
+    try:
+        selected = tenants.select(update.effective_chat.id, context.args[0])
+    except KeyError:
+        await update.message.reply_text(
+            f"Unknown tenant {context.args[0]}. Available: {', '.join(tenants.names())}"
+        )
+        return
+    await update.message.reply_text(
+        f"This chat now manages {selected.name} ({selected.settings['admin_account']})."
+    )
+
+
 @log_to_sheet
 async def health(update: Update, context: CallbackContext) -> None:
     """Check bot and API health status."""
@@ -677,66 +1744,210 @@ async def health(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text('Not authorized')
         return
 
-    status = {
-        'bot': '🟢 Online',
-        'google_workspace': '🔄 Checking...',
-        'google_sheets': '🔄 Checking...'
-    }
-
-    try:
-        # Check Google Workspace API
-        service.users().list(customer='my_customer', maxResults=1).execute()
-        status['google_workspace'] = '🟢 Connected'
-    except Exception as e:
-        status['google_workspace'] = f'🔴 Error: {str(e)}'
+    # Answered from the background health checks, nothing is called here
+    lines = ["bot: 🟢 Online"]
+    for name, dependency in health_monitor.status().items():
+        if not dependency["checked"]:
+            lines.append(f"{name}: 🔄 Not checked yet")
+            continue
+        line = (
+            f"{name}: {'🟢' if dependency['ok'] else '🔴'} "
+            f"{dependency['latency'] * 1000:.0f} ms, checked {dependency['age']:.0f}s ago"
+        )
+        if dependency["p50"] is not None:
+            line += f" (p50 {dependency['p50'] * 1000:.0f} ms, p95 {dependency['p95'] * 1000:.0f} ms)"
+        lines.append(line)
+        if dependency["last_error"]:
+            error_time = datetime.datetime.fromtimestamp(dependency["last_error_at"])
+            lines.append(
+                f"  last error {error_time:%Y-%m-%d %H:%M:%S}: {dependency['last_error']}"
+            )
+    status_message = "\n".join(lines)
 
-    try:
-        # Check Google Sheets API
-        sheet.get_all_values()
-        status['google_sheets'] = '🟢 Connected'
-    except Exception as e:
-        status['google_sheets'] = f'🔴 Error: {str(e)}'
+    # Time spent building each Google client
+    if google_clients.timings:
+        status_message += "\nStartup: " + ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in google_clients.timings.items()
+        )
 
-    status_message = "\n".join([f"{k}: {v}" for k, v in status.items()])
+    # Executor queue depth, wait times and throttling per API
+    for api, stats in google_api.metrics().items():
+        status_message += (
+            f"\n{api} calls: {stats['running']}/{stats['limit']} running, "
+            f"{stats['queue_depth']} queued, "
+            f"avg wait {stats['avg_wait'] * 1000:.0f} ms, "
+            f"max wait {stats['max_wait'] * 1000:.0f} ms"
+        )
+        if "rate" in stats:
+            status_message += (
+                f"\n{api} limits: {stats['rate']}/s, circuit {stats['circuit']}, "
+                f"{stats['throttled']} throttled, {stats['retries']} retries, "
+                f"{stats['failures']} failures, {stats['rejected']} rejected"
+            )
     await update.message.reply_text(status_message)
 
 
-def setup_logging():
-    """Setup logging configuration"""
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
+@log_to_sheet
+async def stats(update: Update, context: CallbackContext) -> None:
+    """Summarize handler and Google API latency, errors and queue depths."""
+    if not is_authorized(update.message.from_user.username):
+        await update.message.reply_text("You are not authorised to use this command.")
+        return
 
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(console_format)
+    sections = []
+    for title, histogram, errors in (
+        ("Handler", metrics.handler_latency, metrics.handler_errors),
+        ("API", metrics.api_latency, metrics.api_errors),
+    ):
+        rows = [
+            [name, count, f"{p50 * 1000:.0f}", f"{p95 * 1000:.0f}", errors_total]
+            for name, count, p50, p95, errors_total in metrics.summarize(histogram, errors)
+        ]
+        if rows:
+            sections.append(
+                tabulate(
+                    rows,
+                    headers=[title, "Calls", "p50 ms", "p95 ms", "Errors"],
+                    tablefmt="simple",
+                    numalign="left",
+                )
+            )
 
-    # File handler with rotation
-    file_handler = logging.handlers.RotatingFileHandler(
-        'bot.log',
-        maxBytes=1024 * 1024,  # 1MB
-        backupCount=5
+    depths = [
+        [name, value]
+        for (name,), value in sorted(collect_queue_depths().items())
+    ]
+    sections.append(
+        tabulate(depths, headers=["Queue", "Depth"], tablefmt="simple", numalign="left")
     )
-    file_handler.setLevel(logging.INFO)
-    file_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    reads = directory_reads.stats
+    sections.append(
+        f"Directory reads: {reads['calls']} API calls, {reads['shared']} shared, "
+        f"{reads['memo']} reused"
     )
-    file_handler.setFormatter(file_format)
+    await update.message.reply_text("```\n" + "\n\n".join(sections) + "\n```", parse_mode="MarkdownV2")
+
+
+def collect_queue_depths():
+    """Return the current depth of every internal queue, keyed by name."""
+    depths = collections.Counter()
+    for tenant in tenants.built():
+        for api, api_stats in tenant.api.metrics().items():
+            depths[(f"google_api_{api}",)] += api_stats["queue_depth"]
+    depths[("provisioning_jobs",)] = provisioning.queue_depth()
+    depths[("audit_log_rows",)] = audit_log.pending()
+    depths[("mail_outbox",)] = mail_outbox.pending()
+    return depths
+
+
+metrics.register_gauge(
+    "bot_queue_depth", "Items waiting in internal queues.", ("queue",), collect_queue_depths
+)
+
+
+async def error_handler(update: object, context: CallbackContext) -> None:
+    """Report errors that escaped a handler, e.g. an API with an open circuit."""
+    logger.error(f"Error handling update: {context.error}")
+    if isinstance(update, Update) and update.effective_message:
+        if isinstance(context.error, CircuitOpenError):
+            text = str(context.error)
+        else:
+            text = "An error occurred. Please try again later."
+        await update.effective_message.reply_text(text)
+
+
+async def probe_directory():
+    await google_api.run(
+        "directory",
+        lambda: google_clients.directory.users()
+        .list(customer=google_clients.settings["customer"], maxResults=1, fields="users(primaryEmail)")
+        .execute(),
+    )
+
+
+async def probe_gmail():
+    # Also fails when the Gmail token is missing or cannot be refreshed
+    await google_api.run("gmail", lambda: google_clients.gmail.users().getProfile(userId="me").execute())
+
+
+async def probe_sheets():
+    # A single cell instead of the whole accounts sheet
+    await google_api.run("sheets", lambda: google_clients.accounts_sheet.acell("A1"))
+
+
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+health_monitor = HealthMonitor(
+    {"directory": probe_directory, "gmail": probe_gmail, "sheets": probe_sheets},
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT", "10")),
+    stale_after=3 * HEALTH_CHECK_INTERVAL,
+)
+metrics.add_route("/healthz", health_monitor.http_route)
+
+
+async def check_health(context: CallbackContext) -> None:
+    """Periodically probe the Google APIs and Telegram."""
+    await health_monitor.check()
+
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+async def sync_accounts_mirror(context: CallbackContext) -> None:
+    """Periodically read new rows of the accounts sheet of every tenant in use."""
+    for tenant in tenants.built():
+        try:
+            with tenants.activate(tenant.name):
+                await accounts_mirror.sync()
+        except Exception as e:
+            logger.error(f"Error syncing accounts sheet of {tenant.name}: {e}")
 
-    return logger
+
+async def refresh_directory_cache(context: CallbackContext) -> None:
+    """Periodically bring the directory cache of every tenant in use up to date."""
+    for tenant in tenants.built():
+        try:
+            with tenants.activate(tenant.name):
+                await directory_cache.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing directory cache of {tenant.name}: {e}")
+
+
+async def post_init(application: Application) -> None:
+    """Start background tasks once the event loop is running."""
+    logger.info(f"Bot started in {time.monotonic() - STARTED_AT:.2f}s")
+    if os.getenv("METRICS_PORT"):
+        metrics.start_http_server(
+            os.getenv("METRICS_HOST", "127.0.0.1"), int(os.getenv("METRICS_PORT"))
+        )
+    # Other tenants are built when a chat or job first uses them
+    tenants.default.build()
+    audit_log.start()
+    provisioning.start(application.bot.send_message)
+    mail_outbox.start(application.bot.send_message)
+    health_monitor.add_probe("telegram", application.bot.get_me)
+    # Build the Google clients in the background instead of on first command
+    application.create_task(google_api.run("startup", google_clients.warm_up))
+
+
+async def post_shutdown(application: Application) -> None:
+    """Flush pending audit log rows before the process exits."""
+    await provisioning.stop()
+    await mail_outbox.stop()
+    await audit_log.stop()
+    google_api_pool.shutdown(wait=True)
+    log_listener.stop()
 
 
 def main() -> None:
     """Start the bot."""
     token = os.getenv("BOT_TOKEN")
 
-    application = Application.builder().token(token).build()
+    application = (
+        Application.builder()
+        .token(token)
+        # Number of updates processed at the same time
+        .concurrent_updates(int(os.getenv("BOT_CONCURRENT_UPDATES", "256")))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("suspend", suspend_user))
@@ -744,13 +1955,80 @@ def main() -> None:
     application.add_handler(CommandHandler("adduser", add_user))
     application.add_handler(CommandHandler("help", help_command))  # Add this line
     application.add_handler(CommandHandler("listusers", list_users))  # Add this line
+    application.add_handler(CallbackQueryHandler(list_users_page, pattern=r"^lu:"))
     application.add_handler(CommandHandler("resetpw", reset_password))  # Add this line
     application.add_handler(CommandHandler("health", health))  # Add this line
+    application.add_handler(CommandHandler("tenant", switch_tenant))
+    application.add_handler(CommandHandler("bulkadd", bulk_add))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("sweep", sweep))
+    application.add_handler(CallbackQueryHandler(sweep_confirm, pattern=r"^sw:"))
+    application.add_handler(CommandHandler("reconcile", reconcile))
+    application.add_handler(CallbackQueryHandler(reconcile_confirm, pattern=r"^rc:"))
+    application.add_handler(CommandHandler("whorequested", who_requested))
+    application.add_handler(CommandHandler("requests", list_requests))
+    application.add_handler(CommandHandler("audit", audit))
+    application.add_handler(
+        MessageHandler(
+            filters.Document.ALL & filters.CaptionRegex(r"^/bulkadd"), bulk_add
+        )
+    )
     application.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
     )
 
-    application.run_polling()
+    # Record latency and errors of every handler registered above, tag their
+    # log records with the update ID and run them on the chat's tenant
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = metrics.instrument_handler(
+                correlate(tenants.bind(handler.callback))
+            )
+
+    application.add_error_handler(error_handler)
+
+    application.job_queue.run_repeating(
+        refresh_directory_cache,
+        interval=int(os.getenv("DIRECTORY_CACHE_REFRESH_INTERVAL", "900")),
+        first=1,
+    )
+    application.job_queue.run_repeating(
+        sync_accounts_mirror,
+        interval=int(os.getenv("ACCOUNTS_MIRROR_SYNC_INTERVAL", "300")),
+        first=2,
+    )
+    if os.getenv("SWEEP_CHAT_ID"):
+        sweep_interval = int(os.getenv("SWEEP_INTERVAL", "86400"))
+        application.job_queue.run_repeating(
+            inactive_sweep_job, interval=sweep_interval, first=sweep_interval
+        )
+    if os.getenv("RECONCILE_CHAT_ID"):
+        reconcile_interval = int(os.getenv("RECONCILE_INTERVAL", "86400"))
+        application.job_queue.run_repeating(
+            reconcile_job, interval=reconcile_interval, first=reconcile_interval
+        )
+    application.job_queue.run_repeating(
+        check_health, interval=HEALTH_CHECK_INTERVAL, first=5
+    )
+
+    # Pending updates are kept across restarts; on SIGTERM the application
+    # stops receiving updates, finishes the ones in progress and then runs
+    # post_shutdown.
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        secret_token = os.getenv("WEBHOOK_SECRET_TOKEN")
+        if not secret_token or not os.getenv("WEBHOOK_URL"):
+            raise SystemExit("Webhook mode needs WEBHOOK_URL and WEBHOOK_SECRET_TOKEN")
+        url_path = os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+        application.run_webhook(
+            listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            url_path=url_path,
+            webhook_url=f"{os.getenv('WEBHOOK_URL').rstrip('/')}/{url_path}",
+            # Telegram sends it in a header and other requests are rejected
+            secret_token=secret_token,
+        )
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+import asyncio
+import csv
+import io
+import re
+import time
+
+EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+'-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+COLUMNS = ["first_name", "last_name", "desired_email", "secondary_email", "comment"]
+
+
+def read_csv(data):
+    """Read the rows of an uploaded CSV file."""
+    text = data.decode("utf-8-sig")
+    return [row for row in csv.reader(io.StringIO(text)) if any(c.strip() for c in row)]
+
+
+def validate_rows(rows, existing_email=None, suggest=None):
+    """Turn raw rows into people to create, checking every row up front.
+
+    Returns ``(people, errors)`` where ``errors`` is a list of
+    ``(row_number, message)``. A header row is skipped if present.
+    ``suggest(person)`` returns free addresses to offer for a taken one.
+    """
+    people = []
+    errors = []
+    seen = set()
+    start = 1
+    # Skip a header row such as "First name,Last name,Email,..."
+    if rows and not any("@" in cell for cell in rows[0]):
+        start = 2
+
+    for number, row in enumerate(rows[start - 1 :], start=start):
+        cells = [c.strip() for c in row] + [""] * (len(COLUMNS) - len(row))
+        person = dict(zip(COLUMNS, cells))
+        person["comment"] = " ".join(cells[4:]).strip()
+        person["row"] = number
+
+        problems = []
+        if not person["first_name"] or not person["last_name"]:
+            problems.append("first and last name are required")
+        if not EMAIL_RE.match(person["desired_email"]):
+            problems.append(f"invalid desired email '{person['desired_email']}'")
+        if not EMAIL_RE.match(person["secondary_email"]):
+            problems.append(f"invalid secondary email '{person['secondary_email']}'")
+
+        key = person["desired_email"].lower()
+        if key in seen:
+            problems.append(f"{person['desired_email']} appears more than once")
+        elif existing_email and existing_email(key):
+            problem = f"{person['desired_email']} already exists"
+            suggestions = suggest(person) if suggest else []
+            # Addresses requested by earlier rows are not offered
+            suggestions = [address for address in suggestions if address not in seen]
+            if suggestions:
+                problem += f" (free: {', '.join(suggestions)})"
+            problems.append(problem)
+        seen.add(key)
+
+        if problems:
+            errors.append((number, "; ".join(problems)))
+        else:
+            people.append(person)
+
+    return people, errors
+
+
+class Pacer:
+    """Space out operations so that at most ``rate`` start per second."""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
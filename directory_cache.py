@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from email_index import EmailIndex
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryCache:
+    """In-process copy of the Workspace user directory, keyed by primaryEmail.
+
+    ``fetch_page(page_token)`` returns one ``users().list`` response and
+    ``fetch_user(email)`` one ``users().get`` response. When ``db_path`` is
+    set the cache is persisted to SQLite so that it is warm after a restart.
+    ``addresses`` indexes the primary emails and aliases of the cached users.
+    """
+
+    def __init__(self, fetch_page, fetch_user, db_path=None):
+        self._fetch_page = fetch_page
+        self._fetch_user = fetch_user
+        self._users = {}
+        self.addresses = EmailIndex()
+        self._db = None
+        self._refresh_lock = None
+        # Background refetches, referenced so they are not garbage collected
+        self._refetches = set()
+        # Keys put while a refresh walks the directory, None outside a refresh
+        self._put_during_refresh = None
+        self.ready = False
+        self.last_refresh = None
+
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "primary_email TEXT PRIMARY KEY, etag TEXT, data TEXT NOT NULL)"
+            )
+            for (data,) in self._db.execute("SELECT data FROM users"):
+                user = json.loads(data)
+                self._users[user["primaryEmail"].lower()] = user
+                self.addresses.update(user)
+            self.ready = bool(self._users)
+
+    def get(self, email):
+        """Return the cached user or None."""
+        return self._users.get(email.lower())
+
+    def users(self):
+        """Return all cached users ordered by email."""
+        return [self._users[key] for key in sorted(self._users)]
+
+    def put(self, user):
+        """Store a user fetched or returned by an update elsewhere."""
+        user = {k: v for k, v in user.items() if k not in ("password", "hashFunction")}
+        key = user["primaryEmail"].lower()
+        self._users[key] = user
+        self.addresses.update(user)
+        self._save([user])
+        if self._put_during_refresh is not None:
+            self._put_during_refresh.add(key)
+
+    def invalidate(self, email):
+        """Drop a user whose state is unknown and fetch it again in the background.
+
+        Callers that got the changed user back from the API use ``put`` instead.
+        """
+        self._users.pop(email.lower(), None)
+        self._delete([email.lower()])
+        # Its addresses stay in the index, still taken, until the refetch
+        task = asyncio.get_running_loop().create_task(self._refetch(email))
+        self._refetches.add(task)
+        task.add_done_callback(self._refetches.discard)
+
+    async def _refetch(self, email):
+        try:
+            self.put(await self._fetch_user(email))
+        except Exception as e:
+            logger.warning(f"Could not refresh cached user {email}: {e}")
+
+    async def refresh(self):
+        """Walk the directory and apply only the users whose etag changed.
+
+        Users put while the walk runs are newer than the pages, so they are
+        neither overwritten nor removed by it.
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            started = time.monotonic()
+            seen = set()
+            changed = []
+            page_token = None
+            self._put_during_refresh = put = set()
+            try:
+                while True:
+                    results = await self._fetch_page(page_token)
+                    for user in results.get("users", []):
+                        key = user["primaryEmail"].lower()
+                        seen.add(key)
+                        if key in put:
+                            continue
+                        cached = self._users.get(key)
+                        if cached is None or cached.get("etag") != user.get("etag"):
+                            self._users[key] = user
+                            self.addresses.update(user)
+                            changed.append(user)
+                    page_token = results.get("nextPageToken")
+                    if not page_token:
+                        break
+            finally:
+                self._put_during_refresh = None
+
+            removed = [key for key in self._users if key not in seen and key not in put]
+            for key in removed:
+                del self._users[key]
+                self.addresses.remove(key)
+            self._save(changed)
+            self._delete(removed)
+
+            self.ready = True
+            self.last_refresh = time.time()
+            logger.info(
+                f"Directory cache refreshed in {time.monotonic() - started:.1f}s: "
+                f"{len(self._users)} users, {len(changed)} changed, {len(removed)} removed"
+            )
+
+    def _save(self, users):
+        if self._db and users:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO users (primary_email, etag, data) VALUES (?, ?, ?)",
+                    [
+                        (u["primaryEmail"].lower(), u.get("etag"), json.dumps(u))
+                        for u in users
+                    ],
+                )
+
+    def _delete(self, keys):
+        if self._db and keys:
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM users WHERE primary_email = ?", [(k,) for k in keys]
+                )
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+
+
+def _local_part(name):
+    """Lower-case ASCII letters and digits of a name ("José O'Neil" -> "joseoneil")."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", ascii_name.lower())
+
+
+class EmailIndex:
+    """Every primary email and alias of the domain, for O(1) availability checks.
+
+    Maps each address (lower case) to the primary email of the user owning
+    it. Kept up to date by ``DirectoryCache`` as users are listed, fetched
+    and changed.
+    """
+
+    def __init__(self):
+        self._owners = {}
+        self._addresses = {}
+
+    def __len__(self):
+        return len(self._owners)
+
+    def update(self, user):
+        """Index a user's primary email and aliases, replacing what was indexed before."""
+        primary = user["primaryEmail"].lower()
+        self.remove(primary)
+        addresses = {primary}
+        addresses.update(alias.lower() for alias in user.get("aliases", []))
+        addresses.update(alias.lower() for alias in user.get("nonEditableAliases", []))
+        for address in addresses:
+            self._owners[address] = primary
+        self._addresses[primary] = addresses
+
+    def remove(self, primary):
+        for address in self._addresses.pop(primary.lower(), ()):
+            if self._owners.get(address) == primary.lower():
+                del self._owners[address]
+
+    def owner(self, address):
+        """Return the primary email using an address, or None if it is free."""
+        return self._owners.get(address.strip().lower())
+
+    def suggest(self, first_name, last_name, domain, count=3, taken=None):
+        """Return up to ``count`` free addresses for a name.
+
+        Tries first.last, f.last, firstlast and last.first, then first.last2,
+        first.last3 and so on. ``taken(address)`` can rule out more addresses,
+        e.g. ones already requested but not created yet.
+        """
+        first, last = _local_part(first_name), _local_part(last_name)
+        if not first or not last:
+            return []
+        candidates = [f"{first}.{last}", f"{first[0]}.{last}", f"{first}{last}", f"{last}.{first}"]
+        free = []
+        number = 2
+        while len(free) < count and number < 100:
+            if candidates:
+                local = candidates.pop(0)
+            else:
+                local = f"{first}.{last}{number}"
+                number += 1
+            address = f"{local}@{domain.lower()}"
+            if address in self._owners or address in free or (taken and taken(address)):
+                continue
+            free.append(address)
+        return free
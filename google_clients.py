@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+
+import gspread
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from google_transport import ThreadLocalHttp, TokenCache, pooled_session
+
+logger = logging.getLogger(__name__)
+
+# Google Sheets API configuration
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+]
+# Google Workspace API configuration
+WS_SCOPES = ["https://www.googleapis.com/auth/admin.directory.user"]
+# Google Mail API configuration
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+
+
+class GoogleClients:
+    """Registry that builds each Google client on first use.
+
+    Nothing is authorized or opened at import time. Discovery documents come
+    from the copies bundled with google-api-python-client, spreadsheets are
+    opened by key when one is configured, and the time spent building each
+    component is kept in ``timings``. ``settings`` holds the tenant's
+    credentials and spreadsheets (see ``tenants.SETTINGS``).
+
+    Credentials come from ``token_cache``, so clients with the same account
+    and scopes share one access token. The API clients are safe to use from
+    several threads, and gspread keeps up to ``pool_size`` connections open.
+    """
+
+    def __init__(self, settings, token_cache=None, pool_size=2):
+        self.settings = settings
+        self._token_cache = token_cache or TokenCache()
+        self._pool_size = pool_size
+        self.timings = {}
+        self._clients = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        if name in self._clients:
+            return self._clients[name]
+        with self._lock:
+            if name not in self._clients:
+                started = time.monotonic()
+                self._clients[name] = factory()
+                self.timings[name] = time.monotonic() - started
+                logger.info(f"Built {name} in {self.timings[name]:.2f}s")
+            return self._clients[name]
+
+    @property
+    def sheets(self):
+        """Authorized gspread client."""
+        return self._get("sheets", self._build_sheets)
+
+    @property
+    def accounts_sheet(self):
+        """First worksheet of the accounts spreadsheet."""
+        return self._get("accounts_sheet", self._open_accounts_sheet)
+
+    @property
+    def log_spreadsheet(self):
+        """Logs spreadsheet, created if missing."""
+        return self._get("log_spreadsheet", self._open_log_spreadsheet)
+
+    @property
+    def directory(self):
+        """Admin SDK Directory API client."""
+        return self._get("directory", self._build_directory)
+
+    @property
+    def gmail(self):
+        """Gmail API client."""
+        return self._get("gmail", self._build_gmail)
+
+    def warm_up(self):
+        """Build every client, logging failures instead of raising."""
+        for name in ("directory", "gmail", "sheets", "accounts_sheet", "log_spreadsheet"):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                logger.error(f"Error building {name}: {e}")
+
+    def _build_sheets(self):
+        creds = self._token_cache.service_account(self.settings["creds_file"], SCOPE)
+        return gspread.authorize(None, session=pooled_session(creds, self._pool_size))
+
+    def _open_spreadsheet(self, key_setting, name_setting):
+        key = self.settings[key_setting]
+        if key:
+            return self.sheets.open_by_key(key)
+        # Opening by name needs a Drive search, so suggest the key instead
+        spreadsheet = self.sheets.open(self.settings[name_setting])
+        logger.info(f"Set {key_setting} to {spreadsheet.id} to open {spreadsheet.title} faster")
+        return spreadsheet
+
+    def _open_accounts_sheet(self):
+        return self._open_spreadsheet("spreadsheet_key", "spreadsheet_filename").sheet1
+
+    def _open_log_spreadsheet(self):
+        try:
+            # Trying to open log spreadsheet
+            return self._open_spreadsheet("logs_sheet_key", "logs_sheet_filename")
+        except gspread.exceptions.SpreadsheetNotFound:
+            # If it is not exists, trying to create it; the audit log adds
+            # a worksheet with headers for each month
+            return self.sheets.create(self.settings["logs_sheet_filename"])
+
+    def _build_directory(self):
+        creds = self._token_cache.service_account(
+            self.settings["creds_file"], WS_SCOPES, subject=self.settings["admin_account"]
+        )
+        return build(
+            "admin",
+            "directory_v1",
+            http=ThreadLocalHttp(creds),
+            static_discovery=True,
+        )
+
+    def _build_gmail(self):
+        token_file = self.settings["gmail_token_file"]
+        creds = self._token_cache.get(
+            ("authorized_user", token_file), lambda: self._load_gmail_token(token_file)
+        )
+        return build("gmail", "v1", http=ThreadLocalHttp(creds), static_discovery=True)
+
+    @staticmethod
+    def _load_gmail_token(token_file):
+        creds = None
+        if os.path.exists(token_file):
+            creds = Credentials.from_authorized_user_file(token_file, GMAIL_SCOPES)
+        if not creds or not creds.valid:
+            if not (creds and creds.expired and creds.refresh_token):
+                # The browser consent flow cannot run inside the bot
+                raise RuntimeError(
+                    f"No valid Gmail token in {token_file}, "
+                    "run tests/test_gmail.py to authorize Gmail"
+                )
+            creds.refresh(Request())
+            with open(token_file, "w") as token:
+                token.write(creds.to_json())
+        return creds
@@ -0,0 +1,110 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class GoogleExecutor:
+    """Run blocking Google API calls on a bounded thread pool.
+
+    Each API ("directory", "gmail", "sheets") has its own concurrency limit,
+    so a slow listing cannot use up every worker. Queue depth and wait time
+    are tracked per API. Calls to an API with an ``ApiGuard`` in ``guards``
+    are also rate limited and retried by it. ``on_call(api, seconds, error)``
+    is called after every call, including retries in the duration.
+
+    Several executors can share one ``pool`` of threads (one per tenant,
+    each with its own limits and guards).
+    """
+
+    def __init__(
+        self, max_workers=8, limits=None, default_limit=2, guards=None, on_call=None, pool=None
+    ):
+        self._pool = pool or ThreadPoolExecutor(max_workers, thread_name_prefix="google-api")
+        self._guards = dict(guards or {})
+        self._on_call = on_call
+        self._limits = dict(limits or {})
+        self._default_limit = default_limit
+        self._semaphores = {}
+        self._stats = {}
+
+    def _semaphore(self, api):
+        if api not in self._semaphores:
+            self._semaphores[api] = asyncio.Semaphore(
+                self._limits.get(api, self._default_limit)
+            )
+            self._stats[api] = {
+                "queued": 0,
+                "running": 0,
+                "calls": 0,
+                "wait_total": 0.0,
+                "wait_max": 0.0,
+            }
+        return self._semaphores[api]
+
+    async def run(self, api, func, *args, idempotent=True, **kwargs):
+        """Run ``func(*args, **kwargs)`` off the event loop under the API's limit.
+
+        Pass ``idempotent=False`` for writes that must not be repeated after
+        an unclear failure (see ``ApiGuard.call``).
+        """
+        guard = self._guards.get(api)
+        started = time.monotonic()
+        error = None
+        try:
+            if guard:
+                return await guard.call(
+                    lambda: self._run_once(api, func, args, kwargs), idempotent=idempotent
+                )
+            return await self._run_once(api, func, args, kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self._on_call:
+                self._on_call(api, time.monotonic() - started, error)
+
+    async def _run_once(self, api, func, args, kwargs):
+        semaphore = self._semaphore(api)
+        stats = self._stats[api]
+        stats["queued"] += 1
+        queued_at = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            stats["queued"] -= 1
+        try:
+            wait = time.monotonic() - queued_at
+            stats["calls"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            stats["running"] += 1
+            loop = asyncio.get_running_loop()
+            # The call sees the caller's context variables (tenant, correlation ID)
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._pool, functools.partial(context.run, func, *args, **kwargs)
+            )
+        finally:
+            stats["running"] -= 1
+            semaphore.release()
+
+    def metrics(self):
+        """Return queue depth, in-flight calls, wait times and guard counters per API."""
+        return {
+            api: {
+                **(self._guards[api].metrics() if api in self._guards else {}),
+                "queue_depth": stats["queued"],
+                "running": stats["running"],
+                "limit": self._limits.get(api, self._default_limit),
+                "attempts": stats["calls"],
+                "avg_wait": stats["wait_total"] / stats["calls"] if stats["calls"] else 0.0,
+                "max_wait": stats["wait_max"],
+            }
+            for api, stats in self._stats.items()
+        }
+
+    def shutdown(self):
+        """Wait for in-flight calls and stop the worker threads."""
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,85 @@
+import threading
+
+import google_auth_httplib2
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2 import service_account
+
+# Seconds before an HTTP request to a Google API is abandoned
+HTTP_TIMEOUT = 60
+
+
+class TokenCache:
+    """One credentials object per account and scope set, shared by every client.
+
+    All clients and threads that use the same key read the same access
+    token. Tokens are refreshed in the background shortly before they
+    expire (google-auth's non-blocking refresh), so API calls do not wait
+    for a refresh and the token is refreshed once, not once per client.
+    """
+
+    def __init__(self):
+        self._credentials = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """Return the credentials for ``key``, creating them with ``factory()`` once."""
+        with self._lock:
+            if key not in self._credentials:
+                credentials = factory()
+                credentials.with_non_blocking_refresh()
+                self._credentials[key] = credentials
+            return self._credentials[key]
+
+    def service_account(self, creds_file, scopes, subject=None):
+        """Return service account credentials, delegated to ``subject`` if given."""
+
+        def factory():
+            credentials = service_account.Credentials.from_service_account_file(
+                creds_file, scopes=scopes
+            )
+            return credentials.with_subject(subject) if subject else credentials
+
+        return self.get(("service_account", creds_file, subject, tuple(sorted(scopes))), factory)
+
+
+class ThreadLocalHttp:
+    """httplib2.Http stand-in that gives each thread its own authorized connections.
+
+    httplib2 is not thread-safe, so every executor thread keeps its own
+    AuthorizedHttp, whose TLS connections stay open between calls. They
+    all share ``credentials`` and so one access token.
+    """
+
+    def __init__(self, credentials, timeout=HTTP_TIMEOUT):
+        self.credentials = credentials
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=self._timeout)
+            )
+            self._local.http = http
+        return http
+
+    def request(self, *args, **kwargs):
+        return self._http().request(*args, **kwargs)
+
+    def close(self):
+        """Close the connections of the calling thread."""
+        http = getattr(self._local, "http", None)
+        if http is not None:
+            http.close()
+            self._local.http = None
+
+
+def pooled_session(credentials, pool_size):
+    """Return an AuthorizedSession keeping up to ``pool_size`` connections per host."""
+    session = AuthorizedSession(credentials)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,111 @@
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class HealthMonitor:
+    """Probes the bot's dependencies in the background and keeps the results.
+
+    ``probes`` maps a dependency name to a coroutine function that makes one
+    cheap call and raises on failure. ``check()`` runs all probes at once and
+    records each one's latency, so status requests are answered from memory.
+    A dependency is healthy when its last probe succeeded and is not older
+    than ``stale_after`` seconds.
+    """
+
+    def __init__(self, probes=None, timeout=10.0, history=100, stale_after=300.0):
+        self._probes = dict(probes or {})
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._history = history
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def add_probe(self, name, probe):
+        self._probes[name] = probe
+
+    async def check(self):
+        """Run every probe once and record the results."""
+        await asyncio.gather(*(self._check_one(name, probe) for name, probe in self._probes.items()))
+
+    async def _check_one(self, name, probe):
+        started = time.monotonic()
+        error = None
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"no response within {self.timeout:.0f}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency = time.monotonic() - started
+
+        with self._lock:
+            state = self._state.setdefault(
+                name,
+                {
+                    "latencies": collections.deque(maxlen=self._history),
+                    "checks": 0,
+                    "failures": 0,
+                    "last_error": None,
+                    "last_error_at": None,
+                },
+            )
+            state["checks"] += 1
+            state["ok"] = error is None
+            state["latency"] = latency
+            state["checked_at"] = time.time()
+            if error is None:
+                state["latencies"].append(latency)
+            else:
+                state["failures"] += 1
+                state["last_error"] = error
+                state["last_error_at"] = state["checked_at"]
+        if error is not None:
+            logger.warning(f"Health probe {name} failed: {error}")
+
+    def status(self):
+        """Return a snapshot of every dependency's health, keyed by name."""
+        now = time.time()
+        result = {}
+        with self._lock:
+            for name in self._probes:
+                state = self._state.get(name)
+                if state is None:
+                    result[name] = {"ok": False, "checked": False}
+                    continue
+                latencies = list(state["latencies"])
+                result[name] = {
+                    "ok": state["ok"] and now - state["checked_at"] <= self.stale_after,
+                    "checked": True,
+                    "latency": state["latency"],
+                    "age": now - state["checked_at"],
+                    "p50": _percentile(latencies, 0.5),
+                    "p95": _percentile(latencies, 0.95),
+                    "checks": state["checks"],
+                    "failures": state["failures"],
+                    "last_error": state["last_error"],
+                    "last_error_at": state["last_error_at"],
+                }
+        return result
+
+    def healthy(self):
+        return all(dependency["ok"] for dependency in self.status().values())
+
+    def http_route(self):
+        """``metrics.add_route`` handler: 200 when healthy, 503 otherwise."""
+        status = self.status()
+        healthy = all(dependency["ok"] for dependency in status.values())
+        body = json.dumps({"healthy": healthy, "dependencies": status}, indent=2)
+        return 200 if healthy else 503, "application/json", body
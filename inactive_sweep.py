@@ -0,0 +1,60 @@
+import datetime
+
+from user_listing import NEVER_LOGGED_IN
+
+# Cohorts in report order: key, description
+COHORTS = [
+    ("never", "never logged in"),
+    ("idle", "idle"),
+]
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+
+
+def classify_users(users, never_logged_in_days, idle_days, skip=(), now=None):
+    """Sort active users into inactivity cohorts.
+
+    "never" holds users who never logged in and were created more than
+    ``never_logged_in_days`` ago, "idle" users whose last login is older than
+    ``idle_days``. Suspended users, admins and emails in ``skip`` are left
+    out. Returns ``{cohort: [user, ...]}`` with every cohort key present.
+    Timestamps are compared as ISO strings, as in ``user_listing``.
+    """
+    now = now or datetime.datetime.utcnow()
+    created_cutoff = (now - datetime.timedelta(days=never_logged_in_days)).strftime(TIMESTAMP_FORMAT)
+    login_cutoff = (now - datetime.timedelta(days=idle_days)).strftime(TIMESTAMP_FORMAT)
+    skip = {email.lower() for email in skip}
+
+    cohorts = {key: [] for key, _ in COHORTS}
+    for user in users:
+        if user.get("suspended") or user.get("isAdmin"):
+            continue
+        if user["primaryEmail"].lower() in skip:
+            continue
+        last_login = user.get("lastLoginTime", NEVER_LOGGED_IN)
+        if last_login == NEVER_LOGGED_IN:
+            if user.get("creationTime", "") < created_cutoff:
+                cohorts["never"].append(user)
+        elif last_login < login_cutoff:
+            cohorts["idle"].append(user)
+    return cohorts
+
+
+def render_report(cohorts, never_logged_in_days, idle_days, limit=20):
+    """Return the dry-run report listing up to ``limit`` users per cohort."""
+    criteria = {
+        "never": f"never logged in, created over {never_logged_in_days} days ago",
+        "idle": f"no login for {idle_days} days",
+    }
+    total = sum(len(users) for users in cohorts.values())
+    lines = [f"Inactive account sweep (dry run): {total} accounts would be suspended."]
+    for key, _ in COHORTS:
+        users = cohorts[key]
+        lines.append(f"\n{criteria[key]}: {len(users)}")
+        for user in users[:limit]:
+            last_login = user.get("lastLoginTime", NEVER_LOGGED_IN)
+            seen = "never" if last_login == NEVER_LOGGED_IN else last_login[:10]
+            lines.append(f"  {user['primaryEmail']} (created {user.get('creationTime', '')[:10]}, last login {seen})")
+        if len(users) > limit:
+            lines.append(f"  ... and {len(users) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,147 @@
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import uuid
+from functools import wraps
+
+# ID of the Telegram update being handled, added to every log record
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# password=..., "password": "...", Password: ... (e.g. in email text)
+PASSWORD_RE = re.compile(
+    r"""(?P<key>["']?password["']?\s*[:=]\s*)(?P<quote>["']?)(?P<value>[^\s"',}]+)""",
+    re.IGNORECASE,
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s"
+
+
+def redact(text):
+    """Replace password values in a log message with [REDACTED]."""
+    return PASSWORD_RE.sub(r"\g<key>\g<quote>[REDACTED]", text)
+
+
+class ContextFilter(logging.Filter):
+    """Add the correlation ID of the running update to a record.
+
+    Filters on the QueueHandler run in the thread that logs, where the
+    context variable is set. Passwords are redacted later by the formatters
+    on the listener thread.
+    """
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the records below WARNING from noisy loggers.
+
+    ``rates`` maps a logger name (children included) to the share to keep,
+    e.g. ``{"httpx": 0.01}`` for one in a hundred polling requests.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates.items():
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlation_id": getattr(record, "correlation_id", None),
+            "message": redact(record.getMessage()),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Format records with TEXT_FORMAT and redact passwords."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record):
+        return redact(super().formatMessage(record))
+
+
+def parse_sample_rates(spec):
+    """Turn "httpx=0.01,apscheduler=0.1" into a dict of rates."""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging():
+    """Send all log records through a queue to console and file handlers.
+
+    Handlers run on a listener thread, so writing logs never blocks the
+    event loop. Returns the listener; call ``stop()`` on it at shutdown to
+    flush what is still queued.
+    """
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    # File handler with rotation
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.getenv("LOG_FILE", "bot.log"),
+        maxBytes=1024 * 1024,  # 1MB
+        backupCount=5,
+    )
+    file_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(os.getenv("LOG_SAMPLE", "httpx=0.01"))))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.handlers = [queue_handler]
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler)
+    listener.start()
+    return listener
+
+
+def correlate(func):
+    """Wrap a Telegram handler so its log records carry the update ID."""
+
+    @wraps(func)
+    async def wrapper(update, *args, **kwargs):
+        update_id = getattr(update, "update_id", None)
+        token = correlation_id.set(str(update_id) if update_id is not None else uuid.uuid4().hex[:8])
+        try:
+            return await func(update, *args, **kwargs)
+        finally:
+            correlation_id.reset(token)
+
+    return wrapper
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class MailOutbox:
+    """Persistent outbox for emails, sent by a small pool of async workers.
+
+    Messages built by ``create_message`` are stored in SQLite and sent in
+    batches through ``send_batch(items, tenant)``, which takes ``(id, message)``
+    pairs of one tenant and returns ``{id: (response, error)}``. Sending is paced to ``rate``
+    messages per second, failed messages are retried with exponential
+    backoff, and the result is reported to the chat that queued them.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        send_batch,
+        rate=2.0,
+        workers=2,
+        batch_size=50,
+        max_attempts=5,
+        retry_delay=60.0,
+    ):
+        self._db_path = db_path
+        self._db = None
+        self._send_batch = send_batch
+        self._bucket = TokenBucket(rate, max(1, int(rate)))
+        self._workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._notify = None
+        self._wakeup = None
+        self._tasks = []
+        # Kept in memory, the metrics thread cannot use the SQLite connection
+        self._pending = 0
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self._db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "description TEXT NOT NULL, "
+            "message TEXT, "
+            "chat_id INTEGER, "
+            "notify TEXT NOT NULL, "
+            "state TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, "
+            "error TEXT, "
+            "created_at REAL NOT NULL, "
+            "sent_at REAL)"
+        )
+        columns = [row["name"] for row in self._db.execute("PRAGMA table_info(outbox)")]
+        if "tenant" not in columns:
+            # Outboxes created before multi-tenant support
+            self._db.execute("ALTER TABLE outbox ADD COLUMN tenant TEXT")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, next_attempt_at)"
+        )
+        with self._db:
+            # Failed messages used to keep their credentials
+            self._db.execute(
+                "UPDATE outbox SET message = NULL WHERE state = 'failed' AND message IS NOT NULL"
+            )
+
+    def enqueue(self, message, description, chat_id=None, notify="all", tenant=None):
+        """Store a message for sending and return its outbox ID.
+
+        ``notify`` is "all" to report every result to ``chat_id`` or
+        "failures" to report only messages that could not be sent.
+        ``tenant`` is the name of the tenant whose Gmail sends the message.
+        """
+        now = time.time()
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (description, message, chat_id, notify, state, "
+                "next_attempt_at, created_at, tenant) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (description, json.dumps(message), chat_id, notify, now, now, tenant),
+            )
+        self._pending += 1
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def pending(self):
+        """Return the number of messages waiting to be sent."""
+        return self._pending
+
+    def start(self, notify):
+        """Start the workers; ``notify(chat_id, text)`` reports results."""
+        self._connect()
+        # Messages being sent when the bot stopped are sent again
+        with self._db:
+            self._db.execute("UPDATE outbox SET state = 'queued' WHERE state = 'sending'")
+        self._pending = self._db.execute(
+            "SELECT COUNT(*) FROM outbox WHERE state = 'queued'"
+        ).fetchone()[0]
+        self._notify = notify
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self._workers)]
+
+    async def stop(self):
+        """Stop the workers; unsent messages stay in the outbox."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _claim(self):
+        """Mark up to ``batch_size`` due messages of one tenant as being sent and return them."""
+        now = time.time()
+        first = self._db.execute(
+            "SELECT tenant FROM outbox WHERE state = 'queued' AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at LIMIT 1",
+            (now,),
+        ).fetchone()
+        if first is None:
+            return []
+        rows = self._db.execute(
+            "SELECT * FROM outbox WHERE state = 'queued' AND next_attempt_at <= ? "
+            "AND tenant IS ? ORDER BY next_attempt_at LIMIT ?",
+            (now, first["tenant"], self.batch_size),
+        ).fetchall()
+        if rows:
+            with self._db:
+                self._db.executemany(
+                    "UPDATE outbox SET state = 'sending' WHERE id = ?",
+                    [(row["id"],) for row in rows],
+                )
+        return rows
+
+    def _next_due_in(self):
+        row = self._db.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE state = 'queued'"
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    async def _work(self):
+        while True:
+            rows = self._claim()
+            if not rows:
+                self._wakeup.clear()
+                timeout = self._next_due_in()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(timeout or 30, 30))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for _ in rows:
+                await self._bucket.acquire()
+            try:
+                results = await self._send_batch(
+                    [(row["id"], json.loads(row["message"])) for row in rows],
+                    rows[0]["tenant"],
+                )
+            except Exception as e:
+                results = {row["id"]: (None, e) for row in rows}
+
+            for row in rows:
+                try:
+                    _, error = results.get(row["id"], (None, "no response"))
+                    await self._record(row, error)
+                except Exception as e:
+                    logger.error(f"Error recording outbox message {row['id']}: {e}")
+
+    async def _record(self, row, error):
+        if error is None:
+            # The message holds credentials, so it is not kept once sent
+            with self._db:
+                self._db.execute(
+                    "UPDATE outbox SET state = 'sent', message = NULL, sent_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (time.time(), row["id"]),
+                )
+            self._pending -= 1
+            if row["notify"] == "all" and row["chat_id"]:
+                await self._notify(row["chat_id"], f"📧 Sent: {row['description']}")
+            return
+
+        attempts = row["attempts"] + 1
+        if attempts >= self.max_attempts:
+            logger.error(f"Giving up on outbox message {row['id']}: {error}")
+            # It will not be sent again, so its credentials are not kept either
+            with self._db:
+                self._db.execute(
+                    "UPDATE outbox SET state = 'failed', message = NULL, attempts = ?, "
+                    "error = ? WHERE id = ?",
+                    (attempts, str(error), row["id"]),
+                )
+            self._pending -= 1
+            if row["chat_id"]:
+                await self._notify(
+                    row["chat_id"],
+                    f"❌ Could not send: {row['description']} ({error})",
+                )
+            return
+
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        logger.warning(f"Outbox message {row['id']} failed ({error}), retry in {delay:.0f}s")
+        with self._db:
+            self._db.execute(
+                "UPDATE outbox SET state = 'queued', attempts = ?, error = ?, "
+                "next_attempt_at = ? WHERE id = ?",
+                (attempts, str(error), time.time() + delay, row["id"]),
+            )
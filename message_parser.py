@@ -0,0 +1,87 @@
+import re
+
+from bulk_onboarding import EMAIL_RE
+
+# "First Last" or "First Double-Barrelled Last", letters in any script
+_WORD = r"[^\W\d_](?:[^\W\d_]|['.-])*"
+NAME_RE = re.compile(rf"^(?P<first>{_WORD})\s+(?P<last>{_WORD}(?:\s+{_WORD})*)$")
+
+FORMAT_HINT = (
+    "Please send one block per person:\n"
+    "Name Surname\nDesired email\nExisting email\nComment (optional, may span lines)\n"
+    "Separate people with an empty line or just start the next block."
+)
+
+
+def _looks_like_address(line):
+    """A line holding one address, valid or not ("cc: boss@x.com" is not one)."""
+    return "@" in line and len(line.split()) == 1
+
+
+def _starts_block(lines, i):
+    """A block starts at a non-empty line followed by a line holding one address."""
+    return bool(lines[i]) and i + 1 < len(lines) and _looks_like_address(lines[i + 1])
+
+
+def parse_people(text):
+    """Extract every person block from a free-text request in one pass.
+
+    A block starts at a line followed by a line holding a single address and
+    reads: name, desired email, secondary email, then comment lines up to the
+    next block or an empty line. Comment lines that merely mention an email
+    ("cc: boss@example.com") do not start a block. Lines before the first
+    block (greetings, "We need a new member:") are ignored. The name and both
+    emails are validated, so a typo is reported for its block instead of
+    dropping the person.
+
+    Returns ``(people, errors)`` where ``errors`` is a list of
+    ``(block_number, message)``; a block with errors is not in ``people``.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    people = []
+    errors = []
+    block = 0
+    i = 0
+    count = len(lines)
+    while i < count:
+        if not _starts_block(lines, i):
+            i += 1
+            continue
+
+        block += 1
+        name, desired = lines[i], lines[i + 1]
+        i += 2
+        secondary = ""
+        if i < count and "@" in lines[i]:
+            secondary = lines[i]
+            i += 1
+        comment = []
+        # Comment lines run until an empty line or the start of the next block
+        while i < count and lines[i] and not _starts_block(lines, i):
+            comment.append(lines[i])
+            i += 1
+
+        match = NAME_RE.match(name)
+        problems = []
+        if not match:
+            problems.append(f"'{name}' is not a first and last name")
+        if not EMAIL_RE.match(desired):
+            problems.append(f"invalid desired email '{desired}'")
+        if not secondary:
+            problems.append("the secondary email is missing")
+        elif not EMAIL_RE.match(secondary):
+            problems.append(f"invalid secondary email '{secondary}'")
+        if problems:
+            errors.append((block, "; ".join(problems)))
+            continue
+        people.append(
+            {
+                "first_name": match.group("first"),
+                "last_name": match.group("last"),
+                "desired_email": desired,
+                "secondary_email": secondary,
+                "comment": " ".join(comment),
+                "block": block,
+            }
+        )
+    return people, errors
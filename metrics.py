@@ -0,0 +1,261 @@
+import http.server
+import logging
+import threading
+import time
+from functools import wraps
+
+from googleapiclient.errors import HttpError
+import gspread
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets and labels."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {
+                    "counts": [0] * len(self.buckets),
+                    "count": 0,
+                    "sum": 0.0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["count"] += 1
+            series["sum"] += value
+
+    def series(self):
+        """Return a copy of every label set's bucket counts, count and sum."""
+        with self._lock:
+            return {
+                labels: dict(series, counts=list(series["counts"]))
+                for labels, series in self._series.items()
+            }
+
+    def quantile(self, q, series):
+        """Estimate a quantile of one series by interpolating inside its bucket."""
+        if not series["count"]:
+            return 0.0
+        rank = q * series["count"]
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, series["counts"]):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        # Above the largest bucket
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series['count']}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series['sum']}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose labelled values are read from a callback when rendered."""
+
+    def __init__(self, name, help_text, labels, collect):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._collect = collect
+
+    def values(self):
+        try:
+            return self._collect()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {e}")
+            return {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+handler_latency = Histogram(
+    "bot_handler_latency_seconds", "Telegram handler latency.", ("handler",)
+)
+handler_errors = Counter(
+    "bot_handler_errors_total", "Exceptions raised by Telegram handlers.", ("handler", "reason")
+)
+api_latency = Histogram(
+    "bot_google_api_latency_seconds",
+    "Google API call latency including retries.",
+    ("api",),
+)
+api_errors = Counter(
+    "bot_google_api_errors_total", "Failed Google API calls.", ("api", "reason")
+)
+registry = [handler_latency, handler_errors, api_latency, api_errors]
+
+
+def register_gauge(name, help_text, labels, collect):
+    """Add a gauge read from ``collect()``, a dict of label tuples to values."""
+    registry.append(Gauge(name, help_text, labels, collect))
+
+
+def error_reason(error):
+    """Return a low-cardinality label for an exception."""
+    if isinstance(error, HttpError):
+        return f"http_{error.resp.status}"
+    if isinstance(error, gspread.exceptions.APIError):
+        return f"http_{error.response.status_code}"
+    return type(error).__name__
+
+
+def observe_api_call(api, seconds, error):
+    """Record one Google API call (used as the executor's ``on_call`` hook)."""
+    api_latency.observe(seconds, api)
+    if error is not None:
+        api_errors.inc(api, error_reason(error))
+
+
+def instrument_handler(func):
+    """Wrap a Telegram handler to record its latency and errors."""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            handler_errors.inc(func.__name__, error_reason(e))
+            raise
+        finally:
+            handler_latency.observe(time.monotonic() - started, func.__name__)
+
+    return wrapper
+
+
+def render():
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def summarize(histogram, errors):
+    """Return ``(label, count, p50, p95, errors)`` rows for a histogram."""
+    error_totals = {}
+    for label_values, value in errors.values().items():
+        error_totals[label_values[0]] = error_totals.get(label_values[0], 0) + value
+    rows = []
+    for label_values, series in sorted(histogram.series().items()):
+        rows.append(
+            (
+                label_values[0],
+                series["count"],
+                histogram.quantile(0.5, series),
+                histogram.quantile(0.95, series),
+                error_totals.get(label_values[0], 0),
+            )
+        )
+    return rows
+
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    routes = {}
+
+    def do_GET(self):
+        route = self.routes.get(self.path.split("?")[0])
+        if route is None:
+            self.send_error(404)
+            return
+        status, content_type, body = route()
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are too frequent for the bot log
+        pass
+
+
+def add_route(path, route):
+    """Serve ``route()``, returning ``(status, content_type, body)``, at path."""
+    _MetricsRequestHandler.routes[path] = route
+
+
+add_route(
+    "/metrics",
+    lambda: (200, "text/plain; version=0.0.4; charset=utf-8", render()),
+)
+
+
+def start_http_server(host, port):
+    """Serve the registered routes from a daemon thread and return the server."""
+    server = http.server.ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
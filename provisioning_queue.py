@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Steps of an account provisioning job, in order
+STEPS = ["sheet_row", "workspace_user", "credentials_email"]
+
+
+class StepError(Exception):
+    """Raised by a step with a message to report to the requesting admin."""
+
+
+class ProvisioningQueue:
+    """Persistent queue of account provisioning jobs with resumable steps.
+
+    Each job runs ``STEPS`` in order and records the step it has reached in
+    SQLite, so a job interrupted by a restart continues where it stopped.
+    Jobs are keyed by the desired primary email: submitting the same email
+    again returns the existing job instead of provisioning twice.
+
+    ``steps`` maps a step name to a coroutine function taking the job dict.
+    A step may change ``job["payload"]`` and call ``save_payload`` to keep
+    what it needs if the job is interrupted.
+    """
+
+    def __init__(self, db_path, steps, workers=4):
+        self._db_path = db_path
+        self._db = None
+        self._steps = steps
+        self._notify = None
+        self._workers = workers
+        self._queue = None
+        self._tasks = []
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self._db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "idempotency_key TEXT UNIQUE NOT NULL, "
+            "chat_id INTEGER, "
+            "requested_by TEXT, "
+            "payload TEXT NOT NULL, "
+            "state TEXT NOT NULL, "
+            "step TEXT NOT NULL, "
+            "error TEXT, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        columns = [row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")]
+        if "tenant" not in columns:
+            # Queues created before multi-tenant support
+            self._db.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT")
+
+    def submit(self, person, chat_id, requested_by, tenant=None):
+        """Queue a provisioning job and return ``(job, is_new)``.
+
+        A failed job for the same email is retried from the step that failed,
+        with the details of the new request.
+        """
+        return self.submit_many([person], chat_id, requested_by, tenant=tenant)[0]
+
+    def submit_many(self, people, chat_id, requested_by, start_step=STEPS[0], tenant=None):
+        """Queue jobs for several people in one transaction, like ``submit``.
+
+        New jobs begin at ``start_step``, for callers that already did the
+        earlier steps for the whole batch. ``tenant`` is stored with the job
+        for the steps to use. Returns ``[(job, is_new), ...]``.
+        """
+        now = time.time()
+        results = []
+        queued = []
+        with self._db:
+            for person in people:
+                key = person["desired_email"].strip().lower()
+                existing = self.find(key)
+                if existing and existing["state"] != "failed":
+                    results.append((existing, False))
+                    continue
+                if existing:
+                    job_id = existing["id"]
+                    # What the steps stored (password, insert_sent, ...) is kept
+                    payload = dict(existing["payload"], **person)
+                    self._db.execute(
+                        "UPDATE jobs SET state = 'queued', error = NULL, chat_id = ?, "
+                        "requested_by = ?, tenant = ?, payload = ?, updated_at = ? WHERE id = ?",
+                        (chat_id, requested_by, tenant, json.dumps(payload), now, job_id),
+                    )
+                else:
+                    job_id = uuid.uuid4().hex[:8]
+                    self._db.execute(
+                        "INSERT INTO jobs (id, idempotency_key, chat_id, requested_by, "
+                        "payload, state, step, created_at, updated_at, tenant) "
+                        "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                        (job_id, key, chat_id, requested_by, json.dumps(person), start_step, now, now, tenant),
+                    )
+                queued.append(job_id)
+                results.append((job_id, True))
+        for job_id in queued:
+            self._queue.put_nowait(job_id)
+        return [
+            (self.get(job) if is_new else job, is_new) for job, is_new in results
+        ]
+
+    def find(self, email):
+        """Return the job for a desired email, or None."""
+        row = self._db.execute(
+            "SELECT * FROM jobs WHERE idempotency_key = ?", (email.strip().lower(),)
+        ).fetchone()
+        return self._to_job(row) if row else None
+
+    def active_emails(self):
+        """Return the desired emails of all jobs that have not failed."""
+        return {
+            key
+            for (key,) in self._db.execute(
+                "SELECT idempotency_key FROM jobs WHERE state != 'failed'"
+            )
+        }
+
+    def get(self, job_id):
+        """Return a job by ID, or None."""
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def save_payload(self, job):
+        """Persist changes a step made to the job payload."""
+        self._update(job["id"], payload=json.dumps(job["payload"]))
+
+    def start(self, notify):
+        """Start the workers and resume jobs left unfinished by a restart.
+
+        ``notify(chat_id, text)`` reports job results to the admin.
+        """
+        self._connect()
+        self._notify = notify
+        self._queue = asyncio.Queue()
+        for (job_id,) in self._db.execute(
+            "SELECT id FROM jobs WHERE state IN ('queued', 'running') ORDER BY created_at"
+        ):
+            self._queue.put_nowait(job_id)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self._workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs resume on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Provisioning job {job_id} crashed: {e}")
+
+    async def _run(self, job_id):
+        job = self.get(job_id)
+        if job is None or job["state"] not in ("queued", "running"):
+            return
+        self._update(job_id, state="running")
+
+        for step in STEPS[STEPS.index(job["step"]) :]:
+            try:
+                await self._steps[step](job)
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Provisioning job {job_id} failed at {step}: {error}")
+                self._update(job_id, state="failed", step=step, error=error)
+                await self._notify(
+                    job["chat_id"], f"❌ Job {job_id} failed at {step}: {error}"
+                )
+                return
+            # Record progress (and anything the step stored in the payload)
+            next_step = STEPS[STEPS.index(step) + 1] if step != STEPS[-1] else step
+            self._update(job_id, step=next_step, payload=json.dumps(job["payload"]))
+
+        self._update(job_id, state="done")
+        person = job["payload"]
+        await self._notify(
+            job["chat_id"],
+            f"✅ Job {job_id}: the account for {person['first_name']} "
+            f"{person['last_name']} has been created.",
+        )
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._db:
+            self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    @staticmethod
+    def _to_job(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
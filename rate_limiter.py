@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+from googleapiclient.errors import HttpError
+import gspread
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an API whose circuit breaker is open."""
+
+
+def classify_error(error):
+    """Return ``(kind, retry_after)`` for an exception raised by an API call.
+
+    ``kind`` is "throttled" for 429 and rate-limit 403 responses, "transient"
+    for 5xx and connection errors, and None for errors that must not be
+    retried. ``retry_after`` is the Retry-After delay in seconds, if any.
+    """
+    status = None
+    headers = {}
+    reason = None
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        headers = error.resp
+        try:
+            reason = json.loads(error.content)["error"]["errors"][0]["reason"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            pass
+    elif isinstance(error, gspread.exceptions.APIError):
+        status = error.response.status_code
+        headers = error.response.headers
+    elif isinstance(error, (ConnectionError, TimeoutError, OSError)):
+        return "transient", None
+    else:
+        return None, None
+
+    retry_after = None
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+
+    if status == 429 or (status == 403 and reason in RATE_LIMIT_REASONS):
+        return "throttled", retry_after
+    if status in RETRYABLE_STATUSES:
+        return "transient", retry_after
+    return None, None
+
+
+class TokenBucket:
+    """Token bucket whose refill rate backs off when the API throttles us.
+
+    The rate is halved on every throttle and recovers by 5% of the
+    configured rate on every success.
+    """
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def throttled(self, retry_after=None):
+        self.rate = max(self.max_rate / 20, self.rate / 2)
+        if retry_after:
+            # Every caller waits, not only the one that was throttled
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """Fail fast after ``threshold`` consecutive transient failures.
+
+    After ``cooldown`` seconds calls are let through again; one more failure
+    opens the circuit for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self):
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.cooldown
+        )
+
+    def succeeded(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def failed(self):
+        self._failures += 1
+        if self._failures >= self.threshold:
+            if self._opened_at is None or not self.is_open:
+                logger.warning(f"Circuit opened for {self.cooldown}s")
+            self._opened_at = time.monotonic()
+
+
+class ApiGuard:
+    """Rate limit, retry and circuit-break the calls to one Google API."""
+
+    def __init__(
+        self,
+        name,
+        rate,
+        burst,
+        max_retries=5,
+        base_delay=0.5,
+        max_delay=32.0,
+        breaker_threshold=5,
+        breaker_cooldown=30.0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.counters = {
+            "calls": 0,
+            "throttled": 0,
+            "transient_errors": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+        }
+
+    async def call(self, attempt_call, idempotent=True):
+        """Await ``attempt_call()`` with rate limiting and retries.
+
+        Calls that are not ``idempotent`` (inserts, appends, sends) are only
+        retried when the request was certainly not carried out: throttled, or
+        the connection refused. A 5xx or timeout may come after the write.
+        """
+        if self.breaker.is_open:
+            self.counters["rejected"] += 1
+            raise CircuitOpenError(
+                f"{self.name} API is unavailable, please try again later"
+            )
+
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            self.counters["calls"] += 1
+            try:
+                result = await attempt_call()
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                if kind == "throttled":
+                    self.counters["throttled"] += 1
+                    self.bucket.throttled(retry_after)
+                elif kind == "transient":
+                    self.counters["transient_errors"] += 1
+                    self.breaker.failed()
+
+                retryable = kind == "throttled" or (
+                    kind == "transient" and (idempotent or isinstance(e, ConnectionRefusedError))
+                )
+                if not retryable or attempt >= self.max_retries or self.breaker.is_open:
+                    self.counters["failures"] += 1
+                    raise
+
+                # Full jitter exponential backoff, unless the API told us how long
+                delay = retry_after or random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2 ** attempt)
+                )
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(
+                    f"{self.name} call failed ({e}), retry {attempt} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            self.bucket.succeeded()
+            self.breaker.succeeded()
+            return result
+
+    def metrics(self):
+        """Return the counters plus the current rate and circuit state."""
+        return dict(
+            self.counters,
+            rate=round(self.bucket.rate, 2),
+            circuit="open" if self.breaker.is_open else "closed",
+        )
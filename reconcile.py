@@ -0,0 +1,131 @@
+from accounts_mirror import FIELDS
+
+# Column of the status written back to the accounts sheet ("suspended")
+STATUS_COLUMN = "B"
+SUSPENDED = "suspended"
+
+# Change kinds in report order: key, description
+CHANGES = [
+    ("create", "create missing accounts"),
+    ("update", "update names and secondary emails"),
+    ("suspend", "suspend accounts marked suspended in the sheet"),
+    ("mark", "mark suspended accounts in the sheet"),
+]
+
+
+def _split_name(name):
+    first, _, last = name.strip().partition(" ")
+    return first, last.strip()
+
+
+def _normalize_name(name):
+    return " ".join(name.split()).lower()
+
+
+def plan_changes(rows, users, skip=(), busy=()):
+    """Diff the accounts sheet against the directory in one pass over each.
+
+    ``rows`` are the sheet rows from row 1, ``users`` the directory users.
+    The sheet is the desired state: accounts missing from the directory are
+    created, a different name or secondary email is updated, and a row whose
+    status column says "suspended" suspends the account. Accounts suspended
+    in the directory but not in the sheet are marked in the sheet instead.
+    Emails in ``skip`` (protected accounts) are never changed and emails in
+    ``busy`` (accounts with a provisioning job) are never created. Names are
+    compared as full names, so "Mary Ann Smith" matches givenName "Mary Ann"
+    and familyName "Smith".
+
+    Returns ``(changes, problems)``: ``changes`` is ``{"create": [person],
+    "update": [(email, body)], "suspend": [email], "mark": [(sheet_row,
+    email)]}`` and ``problems`` lists ``(sheet_row, email, message)`` for
+    rows that cannot be applied, such as a missing account with a one-word
+    name.
+    """
+    skip = {email.lower() for email in skip}
+    busy = {email.lower() for email in busy}
+    by_email = {user["primaryEmail"].lower(): user for user in users}
+
+    # The last row for an email wins
+    desired = {}
+    for number, row in enumerate(rows, start=1):
+        if not row or "@" not in row[0]:
+            continue
+        row = list(row) + [""] * (len(FIELDS) + 1 - len(row))
+        desired[row[0].strip().lower()] = (number, row)
+
+    changes = {key: [] for key, _ in CHANGES}
+    problems = []
+    for email, (number, row) in desired.items():
+        if email in skip:
+            continue
+        name = row[FIELDS["name"]].strip()
+        secondary = row[FIELDS["secondary_email"]].strip()
+        marked_suspended = row[1].strip().lower() == SUSPENDED
+        user = by_email.get(email)
+
+        if user is None:
+            if not marked_suspended and email not in busy:
+                first, last = _split_name(name)
+                if not last:
+                    problems.append((number, row[0].strip(), f"'{name}' is not a first and last name"))
+                    continue
+                changes["create"].append(
+                    {
+                        "first_name": first,
+                        "last_name": last,
+                        "desired_email": row[0].strip(),
+                        "secondary_email": secondary,
+                        "comment": row[FIELDS["comment"]].strip(),
+                        "timestamp": row[FIELDS["timestamp"]].strip(),
+                        "requested_by": row[FIELDS["requested_by"]].strip(),
+                    }
+                )
+            continue
+
+        body = {}
+        current = user.get("name", {})
+        full_name = f"{current.get('givenName', '')} {current.get('familyName', '')}"
+        first, last = _split_name(name)
+        # Only a different full name is updated, the split of the sheet name is a guess
+        if first and last and _normalize_name(full_name) != _normalize_name(name):
+            body["name"] = {"givenName": first, "familyName": last}
+        if secondary and secondary.lower() != user.get("recoveryEmail", "").lower():
+            body["recoveryEmail"] = secondary
+        if body:
+            changes["update"].append((user["primaryEmail"], body))
+
+        if marked_suspended and not user.get("suspended", False):
+            changes["suspend"].append(user["primaryEmail"])
+        elif user.get("suspended", False) and not marked_suspended:
+            changes["mark"].append((number, user["primaryEmail"]))
+    return changes, problems
+
+
+def render_plan(changes, problems=(), limit=15):
+    """Return the dry-run report listing up to ``limit`` changes per kind and the problems."""
+    total = sum(len(items) for items in changes.values())
+    lines = [f"Reconciliation (dry run): {total} changes."]
+    for key, description in CHANGES:
+        items = changes[key]
+        if not items:
+            continue
+        lines.append(f"\n{description}: {len(items)}")
+        for item in items[:limit]:
+            if key == "create":
+                lines.append(f"  {item['desired_email']} ({item['first_name']} {item['last_name']})")
+            elif key == "update":
+                email, body = item
+                lines.append(f"  {email}: {', '.join(sorted(body))}")
+            elif key == "suspend":
+                lines.append(f"  {item}")
+            else:
+                lines.append(f"  row {item[0]}: {item[1]}")
+        if len(items) > limit:
+            lines.append(f"  ... and {len(items) - limit} more")
+    if problems:
+        lines.append(f"\nrows that cannot be applied: {len(problems)}")
+        for number, email, message in problems[:limit]:
+            lines.append(f"  row {number}: {email}: {message}")
+        if len(problems) > limit:
+            lines.append(f"  ... and {len(problems) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,53 @@
+import asyncio
+import collections
+import time
+
+
+class SingleFlight:
+    """Coalesce identical concurrent reads and remember results briefly.
+
+    ``run(key, func, *args)`` awaits ``func(*args)`` unless a call with the
+    same key is already in flight, in which case the caller waits for that
+    call instead. Successful results are kept for ``ttl`` seconds; errors are
+    shared with the callers waiting at the time but never remembered.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._in_flight = {}
+        self._results = collections.OrderedDict()
+        self.stats = collections.Counter()
+
+    async def run(self, key, func, *args):
+        cached = self._results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.stats["memo"] += 1
+            return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.stats["calls"] += 1
+            task = asyncio.get_running_loop().create_task(func(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.stats["shared"] += 1
+        # Shielded so that one caller giving up does not cancel the others' call
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic() + self.ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def forget(self, key=None):
+        """Drop one remembered result, or all of them."""
+        if key is None:
+            self._results.clear()
+        else:
+            self._results.pop(key, None)
@@ -0,0 +1,208 @@
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+from functools import wraps
+
+# Name of the tenant the current update or job works on (None: the default)
+current_tenant = contextvars.ContextVar("current_tenant", default=None)
+
+# Tenant setting -> environment variable it is read from for the default tenant
+SETTINGS = {
+    "creds_file": "GWORKSPACE_CREDS_FILE",
+    "admin_account": "GWORKSPACE_ADMIN_ACCOUNT",
+    "customer": "GWORKSPACE_CUSTOMER",
+    "spreadsheet_key": "SPREADSHEET_KEY",
+    "spreadsheet_filename": "SPREADSHEET_FILENAME",
+    "logs_sheet_key": "LOGS_SHEET_KEY",
+    "logs_sheet_filename": "LOGS_SHEET_FILENAME",
+    "gmail_token_file": "GMAIL_TOKEN_FILE",
+    "sender_address": "GMAIL_SENDER_ADDRESS",
+}
+
+# Settings a tenant may take from the default tenant. The others name the
+# tenant's admin, accounts sheet and mailbox, so every tenant sets its own.
+SHARED_SETTINGS = ["creds_file", "customer", "logs_sheet_key", "logs_sheet_filename"]
+REQUIRED_SETTINGS = ["admin_account", "gmail_token_file", "sender_address"]
+
+
+def settings_from_env():
+    """Return the default tenant's settings from the environment."""
+    settings = {name: os.getenv(var) for name, var in SETTINGS.items()}
+    settings["customer"] = settings["customer"] or "my_customer"
+    return settings
+
+
+class Tenant:
+    """One Google Workspace tenant and the components the bot keeps for it.
+
+    Components (clients, API limits, caches) are built together by
+    ``factory(tenant)`` on first use and read as attributes, e.g.
+    ``tenant.directory_cache``.
+    """
+
+    def __init__(self, name, settings, factory, is_default=False):
+        self.name = name
+        self.settings = settings
+        self.is_default = is_default
+        self._factory = factory
+        self._components = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._components is not None
+
+    def path(self, path):
+        """Return a per-tenant variant of a file path ("a/b.db" -> "a/b-acme.db")."""
+        if not path or self.is_default:
+            return path
+        root, extension = os.path.splitext(path)
+        return f"{root}-{self.name}{extension}"
+
+    def build(self):
+        """Build the components unless they exist already."""
+        if self._components is None:
+            with self._lock:
+                if self._components is None:
+                    self._components = self._factory(self)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        self.build()
+        try:
+            return self._components[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class TenantProxy:
+    """Stand-in for a per-tenant component, resolved on every attribute access.
+
+    Lets module-level code keep using one name (``google_clients``) while
+    each update and job works on the component of its own tenant.
+    """
+
+    def __init__(self, registry, component):
+        self._registry = registry
+        self._component = component
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._registry.current(), self._component), name)
+
+
+class TenantRegistry:
+    """The tenants served by this process and the tenant selected in each chat.
+
+    The default tenant comes from the environment (``SETTINGS``). More
+    tenants are read from ``config_file``, a JSON object mapping a tenant
+    name to its settings and optionally the ``"chats"`` it serves. Only
+    ``SHARED_SETTINGS`` left out are taken from the default tenant; a tenant
+    without its own ``REQUIRED_SETTINGS`` and accounts spreadsheet is
+    rejected with ValueError. Chats switched with ``select`` are remembered
+    in SQLite at ``db_path``.
+    """
+
+    def __init__(self, factory, config_file=None, db_path=None, default_name="default"):
+        default = settings_from_env()
+        self.default = Tenant(default_name, default, factory, is_default=True)
+        self._tenants = {default_name: self.default}
+        self._chats = {}
+        if config_file:
+            with open(config_file) as f:
+                config = json.load(f)
+            for name, settings in config.items():
+                settings = dict(settings)
+                for chat_id in settings.pop("chats", []):
+                    self._chats[int(chat_id)] = name
+                unknown = set(settings) - set(SETTINGS)
+                if unknown:
+                    raise ValueError(f"Unknown settings for tenant {name}: {', '.join(sorted(unknown))}")
+                missing = [key for key in REQUIRED_SETTINGS if not settings.get(key)]
+                if not settings.get("spreadsheet_key") and not settings.get("spreadsheet_filename"):
+                    missing.append("spreadsheet_key or spreadsheet_filename")
+                if missing:
+                    raise ValueError(f"Missing settings for tenant {name}: {', '.join(missing)}")
+                shared = {key: default[key] for key in SHARED_SETTINGS}
+                settings = {**dict.fromkeys(SETTINGS), **shared, **settings}
+                self._tenants[name] = Tenant(name, settings, factory)
+        self._db_path = db_path
+        self._db = None
+
+    def _connect(self):
+        if self._db is None and self._db_path:
+            os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self._db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_tenants (chat_id INTEGER PRIMARY KEY, tenant TEXT NOT NULL)"
+            )
+            self._chats.update(self._db.execute("SELECT chat_id, tenant FROM chat_tenants"))
+        return self._db
+
+    def names(self):
+        return list(self._tenants)
+
+    def get(self, name):
+        """Return a tenant by name; KeyError if it is not configured."""
+        return self._tenants[name]
+
+    def built(self):
+        """Return the tenants whose components exist, for background upkeep."""
+        return [tenant for tenant in self._tenants.values() if tenant.built]
+
+    def current(self):
+        """Return the tenant of the running update or job."""
+        name = current_tenant.get()
+        return self._tenants[name] if name else self.default
+
+    def for_chat(self, chat_id):
+        """Return the tenant selected in a chat, or the default tenant."""
+        self._connect()
+        name = self._chats.get(chat_id)
+        return self._tenants.get(name, self.default)
+
+    def select(self, chat_id, name):
+        """Switch a chat to another tenant."""
+        tenant = self.get(name)
+        db = self._connect()
+        if db is not None:
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO chat_tenants (chat_id, tenant) VALUES (?, ?)",
+                    (chat_id, name),
+                )
+        self._chats[chat_id] = name
+        return tenant
+
+    @contextlib.contextmanager
+    def activate(self, name):
+        """Work on a tenant, given by name, inside the ``with`` block.
+
+        The tenant's components are built here, on the caller's thread, so
+        that their SQLite connections belong to the event loop thread.
+        """
+        tenant = self.get(name or self.default.name)
+        tenant.build()
+        token = current_tenant.set(tenant.name)
+        try:
+            yield tenant
+        finally:
+            current_tenant.reset(token)
+
+    def proxy(self, component):
+        return TenantProxy(self, component)
+
+    def bind(self, func):
+        """Wrap a Telegram handler so it works on the tenant of its chat."""
+
+        @wraps(func)
+        async def wrapper(update, *args, **kwargs):
+            chat = getattr(update, "effective_chat", None)
+            tenant = self.for_chat(chat.id) if chat else self.default
+            with self.activate(tenant.name):
+                return await func(update, *args, **kwargs)
+
+        return wrapper
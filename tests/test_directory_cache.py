@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from directory_cache import DirectoryCache
+
+
+def make_cache(pages, during_walk=None):
+    """A cache over fixed pages; ``during_walk(cache)`` runs before the second page."""
+    cache = None
+
+    async def fetch_page(page_token):
+        index = int(page_token or 0)
+        if index == 1 and during_walk:
+            during_walk(cache)
+        result = {"users": [dict(user) for user in pages[index]]}
+        if index + 1 < len(pages):
+            result["nextPageToken"] = str(index + 1)
+        return result
+
+    cache = DirectoryCache(fetch_page, None)
+    return cache
+
+
+def test_refresh_applies_changes_and_removals():
+    pages = [
+        [{"primaryEmail": "a@x.com", "etag": "1", "aliases": ["al@x.com"]}],
+        [{"primaryEmail": "b@x.com", "etag": "1"}],
+    ]
+    cache = make_cache(pages)
+    asyncio.run(cache.refresh())
+    assert [u["primaryEmail"] for u in cache.users()] == ["a@x.com", "b@x.com"]
+    assert cache.addresses.owner("al@x.com") == "a@x.com"
+
+    pages[0] = [{"primaryEmail": "a@x.com", "etag": "2"}]
+    asyncio.run(cache.refresh())
+    assert cache.get("a@x.com")["etag"] == "2"
+    assert cache.addresses.owner("al@x.com") is None
+
+    del pages[1]
+    asyncio.run(cache.refresh())
+    assert cache.get("b@x.com") is None
+    assert cache.addresses.owner("b@x.com") is None
+
+
+def test_users_put_during_a_refresh_are_kept():
+    pages = [[{"primaryEmail": "a@x.com", "etag": "1"}], [{"primaryEmail": "c@x.com", "etag": "1"}]]
+
+    def during_walk(cache):
+        cache.put({"primaryEmail": "b@x.com", "etag": "1"})
+        cache.put({"primaryEmail": "c@x.com", "etag": "2"})
+
+    cache = make_cache(pages, during_walk)
+    asyncio.run(cache.refresh())
+    assert cache.get("b@x.com") is not None
+    assert cache.addresses.owner("b@x.com") == "b@x.com"
+    # The page was read before the update, so it does not overwrite it
+    assert cache.get("c@x.com")["etag"] == "2"
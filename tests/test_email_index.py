@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from email_index import EmailIndex
+
+
+def make_index():
+    index = EmailIndex()
+    index.update(
+        {
+            "primaryEmail": "John.Smith@example.com",
+            "aliases": ["j.smith@example.com"],
+            "nonEditableAliases": ["john.smith@example.test-google-a.com"],
+        }
+    )
+    return index
+
+
+def test_owner_of_primary_emails_and_aliases():
+    index = make_index()
+    assert index.owner(" JOHN.SMITH@example.com ") == "john.smith@example.com"
+    assert index.owner("j.smith@example.com") == "john.smith@example.com"
+    assert index.owner("john.smith@example.test-google-a.com") == "john.smith@example.com"
+    assert index.owner("jane@example.com") is None
+    assert len(index) == 3
+
+
+def test_update_replaces_and_remove_drops_addresses():
+    index = make_index()
+    index.update({"primaryEmail": "john.smith@example.com", "aliases": ["johnny@example.com"]})
+    assert index.owner("j.smith@example.com") is None
+    assert index.owner("johnny@example.com") == "john.smith@example.com"
+    index.remove("John.Smith@example.com")
+    assert len(index) == 0
+
+
+def test_suggest_skips_taken_addresses():
+    index = make_index()
+    assert index.suggest("John", "Smith", "example.com") == [
+        "johnsmith@example.com",
+        "smith.john@example.com",
+        "john.smith2@example.com",
+    ]
+    taken = {"johnsmith@example.com"}
+    assert index.suggest("John", "Smith", "example.com", count=2, taken=taken.__contains__) == [
+        "smith.john@example.com",
+        "john.smith2@example.com",
+    ]
+
+
+def test_suggest_normalizes_names():
+    index = EmailIndex()
+    assert index.suggest("José", "O'Neil", "Example.com", count=1) == ["jose.oneil@example.com"]
+    assert index.suggest("", "Smith", "example.com") == []
@@ -0,0 +1,40 @@
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from inactive_sweep import classify_users
+from user_listing import NEVER_LOGGED_IN
+
+NOW = datetime.datetime(2024, 6, 30, 12, 0)
+
+
+def user(email, created, last_login=NEVER_LOGGED_IN, **fields):
+    return dict(primaryEmail=email, creationTime=created, lastLoginTime=last_login, **fields)
+
+
+def emails(users):
+    return [u["primaryEmail"] for u in users]
+
+
+def test_cohorts():
+    users = [
+        user("old-never@example.com", "2024-06-01T00:00:00.000Z"),
+        user("new-never@example.com", "2024-06-25T00:00:00.000Z"),
+        user("idle@example.com", "2023-01-01T00:00:00.000Z", "2024-03-01T00:00:00.000Z"),
+        user("active@example.com", "2023-01-01T00:00:00.000Z", "2024-06-29T00:00:00.000Z"),
+    ]
+    cohorts = classify_users(users, 14, 90, now=NOW)
+    assert emails(cohorts["never"]) == ["old-never@example.com"]
+    assert emails(cohorts["idle"]) == ["idle@example.com"]
+
+
+def test_suspended_admins_and_skipped_accounts_are_left_out():
+    created = "2023-01-01T00:00:00.000Z"
+    users = [
+        user("suspended@example.com", created, suspended=True),
+        user("admin@example.com", created, isAdmin=True),
+        user("Protected@example.com", created),
+    ]
+    cohorts = classify_users(users, 14, 90, skip=["protected@example.com"], now=NOW)
+    assert cohorts == {"never": [], "idle": []}
@@ -0,0 +1,88 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from message_parser import parse_people
+
+
+def test_single_person_with_comment():
+    people, errors = parse_people(
+        "John Smith\njohn.smith@example.com\njohn@gmail.com\nStarts Monday\nSales team"
+    )
+    assert errors == []
+    assert people == [
+        {
+            "first_name": "John",
+            "last_name": "Smith",
+            "desired_email": "john.smith@example.com",
+            "secondary_email": "john@gmail.com",
+            "comment": "Starts Monday Sales team",
+            "block": 1,
+        }
+    ]
+
+
+def test_greeting_lines_are_ignored():
+    people, errors = parse_people(
+        "Hi!\nWe need a new member:\n\nAnn Lee\nann.lee@example.com\nann@gmail.com"
+    )
+    assert errors == []
+    assert [p["desired_email"] for p in people] == ["ann.lee@example.com"]
+
+
+def test_several_people_with_and_without_empty_lines():
+    people, errors = parse_people(
+        "Ann Lee\nann.lee@example.com\nann@gmail.com\nDesign\n"
+        "Bob Ray\nbob.ray@example.com\nbob@gmail.com\n\n"
+        "Carla Díaz de la Fuente\ncarla@example.com\ncarla@gmail.com"
+    )
+    assert errors == []
+    assert [(p["block"], p["first_name"], p["last_name"], p["comment"]) for p in people] == [
+        (1, "Ann", "Lee", "Design"),
+        (2, "Bob", "Ray", ""),
+        (3, "Carla", "Díaz de la Fuente", ""),
+    ]
+
+
+def test_comment_mentioning_an_email_stays_a_comment():
+    people, errors = parse_people(
+        "John Smith\njohn@x.com\njohn@gmail.com\nStarts Monday\ncc: boss@x.com"
+    )
+    assert errors == []
+    assert len(people) == 1
+    assert people[0]["comment"] == "Starts Monday cc: boss@x.com"
+
+
+def test_missing_secondary_email_is_reported():
+    people, errors = parse_people(
+        "John Smith\njohn@example.com\n\nAnn Lee\nann.lee@example.com\nann@gmail.com"
+    )
+    assert errors == [(1, "the secondary email is missing")]
+    assert [p["block"] for p in people] == [2]
+
+
+def test_invalid_secondary_email_is_reported():
+    people, errors = parse_people("John Smith\njohn@example.com\njohn@gmail")
+    assert people == []
+    assert errors == [(1, "invalid secondary email 'john@gmail'")]
+
+
+def test_text_without_people():
+    assert parse_people("Hello, can you help me?") == ([], [])
+
+
+def test_invalid_desired_email_is_reported_among_several_people():
+    people, errors = parse_people(
+        "Ann Lee\nann.lee@example\nann@gmail.com\n\nBob Ray\nbob@example.com\nbob@gmail.com"
+    )
+    assert errors == [(1, "invalid desired email 'ann.lee@example'")]
+    assert [(p["block"], p["desired_email"]) for p in people] == [(2, "bob@example.com")]
+
+
+def test_one_word_name_is_reported_among_several_people():
+    people, errors = parse_people(
+        "Cher\ncher@example.com\ncher@gmail.com\n"
+        "Bob Ray\nbob@example.com\nbob@gmail.com"
+    )
+    assert errors == [(1, "'Cher' is not a first and last name")]
+    assert [(p["block"], p["desired_email"]) for p in people] == [(2, "bob@example.com")]
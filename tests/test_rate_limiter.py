@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rate_limiter import ApiGuard, TokenBucket, classify_error
+
+
+def http_error(status, reason=None, retry_after=None):
+    headers = {"status": status}
+    if retry_after:
+        headers["retry-after"] = str(retry_after)
+    content = b'{"error": {"errors": [{"reason": "%s"}]}}' % (reason or "x").encode()
+    return HttpError(httplib2.Response(headers), content)
+
+
+def test_classify_error():
+    assert classify_error(http_error(429, retry_after=3)) == ("throttled", 3.0)
+    assert classify_error(http_error(403, "userRateLimitExceeded")) == ("throttled", None)
+    assert classify_error(http_error(403, "forbidden")) == (None, None)
+    assert classify_error(http_error(503)) == ("transient", None)
+    assert classify_error(TimeoutError()) == ("transient", None)
+    assert classify_error(ValueError()) == (None, None)
+
+
+def test_token_bucket_backs_off_and_recovers():
+    bucket = TokenBucket(rate=10, burst=2)
+    bucket.throttled()
+    assert bucket.rate == 5
+    for _ in range(20):
+        bucket.throttled()
+    assert bucket.rate == 0.5
+    bucket.succeeded()
+    assert bucket.rate == 1.0
+    for _ in range(50):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_token_bucket_allows_a_burst():
+    async def main():
+        bucket = TokenBucket(rate=1, burst=3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        return loop.time() - started
+
+    assert asyncio.run(main()) < 0.5
+
+
+def run_guard(error, idempotent):
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise error
+        return "ok"
+
+    async def main():
+        guard = ApiGuard("test", rate=1000, burst=1000, max_retries=2, base_delay=0.001)
+        try:
+            return await guard.call(call, idempotent=idempotent)
+        except Exception as e:
+            return type(e).__name__
+
+    return asyncio.run(main()), len(attempts)
+
+
+def test_idempotent_calls_are_retried_after_transient_errors():
+    assert run_guard(http_error(503), idempotent=True) == ("ok", 2)
+    assert run_guard(TimeoutError(), idempotent=True) == ("ok", 2)
+
+
+def test_writes_are_retried_only_when_nothing_was_written():
+    assert run_guard(http_error(503), idempotent=False) == ("HttpError", 1)
+    assert run_guard(TimeoutError(), idempotent=False) == ("TimeoutError", 1)
+    assert run_guard(http_error(429), idempotent=False) == ("ok", 2)
+    assert run_guard(ConnectionRefusedError(), idempotent=False) == ("ok", 2)
+
+
+def test_permanent_errors_are_not_retried():
+    assert run_guard(http_error(400), idempotent=True) == ("HttpError", 1)
@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from reconcile import plan_changes, render_plan
+
+HEADER = ["Desired email", "", "Name", "Comment", "Secondary email", "Timestamp", "Requested by"]
+
+
+def row(email, name="", secondary="", status=""):
+    return [email, status, name, "", secondary, "", ""]
+
+
+def user(email, given, family, recovery="", suspended=False):
+    return {
+        "primaryEmail": email,
+        "name": {"givenName": given, "familyName": family},
+        "recoveryEmail": recovery,
+        "suspended": suspended,
+    }
+
+
+def test_matching_full_name_is_not_updated():
+    changes, problems = plan_changes(
+        [HEADER, row("mary@example.com", "Mary Ann Smith", "m@home.example")],
+        [user("mary@example.com", "Mary Ann", "Smith", "m@home.example")],
+    )
+    assert changes["update"] == []
+    assert problems == []
+
+
+def test_different_name_and_secondary_are_updated():
+    changes, _ = plan_changes(
+        [HEADER, row("john@example.com", "John  Smith-Jones", "new@home.example")],
+        [user("john@example.com", "John", "Smith", "old@home.example")],
+    )
+    assert changes["update"] == [
+        (
+            "john@example.com",
+            {"name": {"givenName": "John", "familyName": "Smith-Jones"}, "recoveryEmail": "new@home.example"},
+        )
+    ]
+
+
+def test_missing_accounts_are_created():
+    changes, problems = plan_changes([HEADER, row("ann@example.com", "Ann Lee", "a@home.example")], [])
+    assert problems == []
+    assert [(p["desired_email"], p["first_name"], p["last_name"]) for p in changes["create"]] == [
+        ("ann@example.com", "Ann", "Lee")
+    ]
+
+
+def test_one_word_name_is_reported_instead_of_created():
+    changes, problems = plan_changes([HEADER, row("cher@example.com", "Cher", "c@home.example")], [])
+    assert changes["create"] == []
+    assert problems == [(2, "cher@example.com", "'Cher' is not a first and last name")]
+    assert "row 2: cher@example.com" in render_plan(changes, problems)
+
+
+def test_suspend_mark_skip_and_busy():
+    changes, _ = plan_changes(
+        [
+            HEADER,
+            row("a@example.com", "A One", status="suspended"),
+            row("b@example.com", "B Two"),
+            row("admin@example.com", "Ad Min", status="suspended"),
+            row("busy@example.com", "Bu Sy"),
+        ],
+        [
+            user("a@example.com", "A", "One"),
+            user("b@example.com", "B", "Two", suspended=True),
+            user("admin@example.com", "Ad", "Min"),
+        ],
+        skip=["admin@example.com"],
+        busy=["busy@example.com"],
+    )
+    assert changes["suspend"] == ["a@example.com"]
+    assert changes["mark"] == [(3, "b@example.com")]
+    assert changes["create"] == []
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced_and_remembered():
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        flight = SingleFlight(ttl=60)
+        results = await asyncio.gather(*(flight.run("key", fetch, 21) for _ in range(5)))
+        assert results == [42] * 5
+        assert await flight.run("key", fetch, 21) == 42
+        return flight
+
+    flight = asyncio.run(main())
+    assert calls == [21]
+    assert flight.stats == {"calls": 1, "shared": 4, "memo": 1}
+
+
+def test_errors_are_shared_but_not_remembered():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight(ttl=60)
+        results = await asyncio.gather(
+            flight.run("key", fail), flight.run("key", fail), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        try:
+            await flight.run("key", fail)
+        except RuntimeError:
+            pass
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_forget_drops_remembered_results():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight(ttl=60)
+        assert await flight.run("key", fetch) == 1
+        flight.forget("key")
+        assert await flight.run("key", fetch) == 2
+
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tenants import TenantRegistry
+
+ACME = {
+    "admin_account": "admin@acme.com",
+    "spreadsheet_key": "acme-sheet",
+    "gmail_token_file": "credentials/acme-token.json",
+    "sender_address": "noreply@acme.com",
+}
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_only_shared_settings_are_taken_from_the_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("GWORKSPACE_CREDS_FILE", "credentials/service-account.json")
+    monkeypatch.setenv("SPREADSHEET_FILENAME", "Accounts")
+    monkeypatch.setenv("LOGS_SHEET_KEY", "logs-sheet")
+    registry = TenantRegistry(dict, write_config(tmp_path, {"acme": ACME}))
+    settings = registry.get("acme").settings
+    assert settings["creds_file"] == "credentials/service-account.json"
+    assert settings["customer"] == "my_customer"
+    assert settings["logs_sheet_key"] == "logs-sheet"
+    assert settings["spreadsheet_key"] == "acme-sheet"
+    assert settings["spreadsheet_filename"] is None
+
+
+def test_tenant_without_its_own_identity_is_rejected(tmp_path):
+    config = {"acme": {k: v for k, v in ACME.items() if k not in ("sender_address", "spreadsheet_key")}}
+    try:
+        TenantRegistry(dict, write_config(tmp_path, config))
+    except ValueError as e:
+        error = str(e)
+    else:
+        error = None
+    assert error == (
+        "Missing settings for tenant acme: sender_address, spreadsheet_key or spreadsheet_filename"
+    )
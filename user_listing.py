@@ -0,0 +1,122 @@
+import datetime
+import re
+
+from tabulate import tabulate
+
+# Users shown per /listusers page
+PAGE_SIZE = 50
+
+# lastLoginTime reported for users who never logged in
+NEVER_LOGGED_IN = "1970-01-01T00:00:00.000Z"
+
+HEADERS = ["Email", "Status", "Created On", "Last Login"]
+
+
+def parse_list_args(args):
+    """Parse /listusers flags into a filters dict.
+
+    Supported flags: --live, --suspended, --inactive <N>d, --ou <path>, and
+    for exports --export csv|xlsx, --gzip and --columns <a,b,...>.
+    Raises ValueError with a usage hint on bad input.
+    """
+    filters = {
+        "live": False,
+        "suspended": False,
+        "inactive_days": None,
+        "ou": None,
+        "export": None,
+        "gzip": False,
+        "columns": None,
+    }
+    args = list(args or [])
+    while args:
+        arg = args.pop(0)
+        if arg == "--live":
+            filters["live"] = True
+        elif arg == "--suspended":
+            filters["suspended"] = True
+        elif arg == "--inactive" and args:
+            match = re.fullmatch(r"(\d+)d?", args.pop(0))
+            if not match:
+                raise ValueError("--inactive expects a number of days, e.g. 90d")
+            filters["inactive_days"] = int(match.group(1))
+        elif arg == "--ou" and args:
+            filters["ou"] = "/" + args.pop(0).strip("/")
+        elif arg == "--export" and args:
+            filters["export"] = args.pop(0).lower()
+            if filters["export"] not in ("csv", "xlsx"):
+                raise ValueError("--export expects csv or xlsx")
+        elif arg == "--gzip":
+            filters["gzip"] = True
+        elif arg == "--columns" and args:
+            filters["columns"] = args.pop(0)
+        else:
+            raise ValueError(f"Unknown option {arg}")
+    return filters
+
+
+def build_query(filters):
+    """Return the Directory API ``query`` for the filters the API supports."""
+    query = []
+    if filters["suspended"]:
+        query.append("isSuspended=true")
+    if filters["ou"]:
+        query.append(f"orgUnitPath='{filters['ou']}'")
+    return " ".join(query) or None
+
+
+def build_matcher(filters, now=None):
+    """Return a predicate applying all filters to a user resource.
+
+    The Directory API cannot search by last login, so --inactive is always
+    applied here. Timestamps are compared as ISO strings without parsing.
+    """
+    cutoff = None
+    if filters["inactive_days"] is not None:
+        now = now or datetime.datetime.utcnow()
+        cutoff = (now - datetime.timedelta(days=filters["inactive_days"])).strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z"
+        )
+    ou = filters["ou"]
+
+    def matches(user):
+        if filters["suspended"] and not user.get("suspended", False):
+            return False
+        if ou:
+            path = user.get("orgUnitPath", "/")
+            if path != ou and not path.startswith(ou.rstrip("/") + "/"):
+                return False
+        if cutoff and user.get("lastLoginTime", NEVER_LOGGED_IN) >= cutoff:
+            return False
+        return True
+
+    return matches
+
+
+def format_timestamp(value, missing):
+    """Format an API timestamp like 2024-01-31T12:34:56.000Z as 2024-01-31 12:34."""
+    if not value or value == NEVER_LOGGED_IN:
+        return missing
+    return f"{value[:10]} {value[11:16]}"
+
+
+def format_row(user):
+    """Return the table row for a user."""
+    status = "🔴 Suspended" if user.get("suspended", False) else "🟢 Active"
+    return [
+        user["primaryEmail"],
+        status,
+        format_timestamp(user.get("creationTime"), "Unknown"),
+        format_timestamp(user.get("lastLoginTime"), "Never"),
+    ]
+
+
+def render_page(users, page_number):
+    """Render one page of users as a text table."""
+    table = tabulate(
+        [format_row(user) for user in users],
+        headers=HEADERS,
+        tablefmt="simple",
+        numalign="left",
+    )
+    return f"{table}\nPage {page_number}"